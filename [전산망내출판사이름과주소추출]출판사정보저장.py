@@ -1,5 +1,5 @@
-import time
 import pandas as pd
+import lxml.html
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
@@ -18,20 +18,20 @@ driver.get("https://bnk.kpipa.or.kr/home/v3/addition/adiPblshrInfoList")
 
 all_data = []
 
+ROWS_XPATH = '//*[@id="ajaxDiv_get"]/div[2]/div/div/table/tbody/tr'
+
 def parse_table():
     """현재 페이지 테이블의 모든 행 데이터를 리스트로 반환"""
-    wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="ajaxDiv_get"]/div[2]/div/div/table/tbody/tr')))
-    rows = driver.find_elements(By.XPATH, '//*[@id="ajaxDiv_get"]/div[2]/div/div/table/tbody/tr')
+    wait.until(EC.presence_of_element_located((By.XPATH, ROWS_XPATH)))
+    # 페이지 소스를 한 번 받아 lxml로 파싱 (칸마다 WebDriver 왕복하지 않음)
+    rows = lxml.html.fromstring(driver.page_source).xpath(ROWS_XPATH)
     page_data = []
     for row in rows:
-        cols = row.find_elements(By.TAG_NAME, 'td')
+        cols = row.xpath('./td')
         if len(cols) < 4:
             continue
         # 예: 1열=번호, 2열=출판사명, 3열=주소, 4열=전화번호 (페이지 구조에 맞게 조정)
-        num = cols[0].text.strip()
-        publisher = cols[1].text.strip()
-        address = cols[2].text.strip()
-        phone = cols[3].text.strip()
+        num, publisher, address, phone = (" ".join(c.text_content().split()) for c in cols[:4])
         page_data.append([num, publisher, address, phone])
     return page_data
 
@@ -46,10 +46,10 @@ for page_num in range(1, 11):
         try:
             # 다음 버튼 클릭 전 다시 찾아서 클릭 (StaleElementReference 방지)
             next_btn = wait.until(EC.element_to_be_clickable((By.XPATH, '//a[@title="다음 페이지로 이동"]')))
+            old_row = driver.find_element(By.XPATH, ROWS_XPATH)
             driver.execute_script("arguments[0].scrollIntoView(true);", next_btn)
-            time.sleep(0.5)
             next_btn.click()
-            time.sleep(2)  # 페이지 로딩 대기
+            wait.until(EC.staleness_of(old_row))  # 이전 페이지 행이 교체될 때까지만 대기
         except Exception as e:
             print(f"다음 버튼 클릭 실패: {e}")
             break
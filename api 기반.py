@@ -1,10 +1,35 @@
 import streamlit as st
 import requests
 import re
+import orjson
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import copy
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+
+# --- HTTP 세션 (알라딘/KPIPA keep-alive 커넥션 재사용) ---
+# Streamlit은 입력마다 스크립트를 다시 실행하므로 cache_resource로 세션 하나를 rerun 간 유지
+@st.cache_resource
+def _get_session() -> requests.Session:
+    s = requests.Session()
+    s.headers.update({"User-Agent": "Mozilla/5.0"})
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+SESSION = _get_session()
+
+# --- 파싱 대상 노드만 트리로 만드는 SoupStrainer (lxml 파서와 함께 사용) ---
+_ALADIN_SEARCH_STRAINER = SoupStrainer("div", class_="ss_book_box")
+_ALADIN_FORM_STRAINER = SoupStrainer("div", class_="conts_info_list1")
+_KPIPA_SEARCH_STRAINER = SoupStrainer("a", class_="book-grid-item")
+_KPIPA_DETAIL_STRAINER = SoupStrainer(["dt", "dd"])
 
 # --- 구글 시트 데이터 한번만 읽기 및 캐싱 ---
 @st.cache_data(ttl=3600)
@@ -22,15 +47,24 @@ def load_publisher_db():
     publisher_sheet = client.open("출판사 DB").worksheet("시트3")
     region_sheet = client.open("출판사 DB").worksheet("Sheet2")
 
-    publisher_data = publisher_sheet.get_all_values()[1:]  # 헤더 제외
-    region_data = region_sheet.get_all_values()[1:]      # 헤더 제외
+    publisher_rows = publisher_sheet.get_all_values()[1:]  # 헤더 제외
+    region_rows = region_sheet.get_all_values()[1:]        # 헤더 제외
+
+    # 조회 때마다 길이 검사/strip 하지 않도록 로드 시 한 번 정리
+    # publisher_data: (번호, 출판사명, 지역) / region_data: (발행국, 발행국 부호)
+    publisher_data = [(r[0], r[1], r[2].strip()) for r in publisher_rows if len(r) >= 3 and r[1]]
+    region_data = [(r[0], r[1].strip()) for r in region_rows if len(r) >= 2]
 
     return publisher_data, region_data
 
 
 # --- 출판사명 정규화(구글시트 대조용) ---
+# 같은 출판사명이 ISBN마다 반복되므로 순수 함수인 정규화 결과를 캐시
+_PUBLISHER_NOISE_RE = re.compile(r"\s|\(.*?\)|주식회사|㈜|도서출판|출판사|프레스")
+
+@lru_cache(maxsize=4096)
 def normalize_publisher_name(name):
-    return re.sub(r"\s|\(.*?\)|주식회사|㈜|도서출판|출판사|프레스", "", name).lower()
+    return _PUBLISHER_NOISE_RE.sub("", name).lower()
 
 
 # --- 출판사 지역명 표시용 정규화 (UI/260에 쓸 이름) ---
@@ -50,30 +84,24 @@ def normalize_publisher_location_for_display(location_name):
 
 
 # --- 구글시트(publisher_data)에서 출판사 → 지역 조회 (캐시된 데이터 사용) ---
-def get_publisher_location(publisher_name, publisher_data):
+def get_publisher_location(publisher_name, publisher_data, debug_messages):
     try:
-        st.write(f"📥 출판사 지역을 구글 시트에서 찾는 중입니다... `{publisher_name}`")
+        debug_messages.append(f"📥 출판사 지역을 구글 시트에서 찾는 중입니다... `{publisher_name}`")
         target = normalize_publisher_name(publisher_name)
-        st.write(f"🧪 정규화된 입력값: `{target}`")
+        debug_messages.append(f"🧪 정규화된 입력값: `{target}`")
+        raw = publisher_name.strip()
 
-        for row in publisher_data:
-            if len(row) < 3:
-                continue
-            sheet_name, region = row[1], row[2]
+        # 정규화 일치는 바로 반환, 원본 문자열 일치(fallback)는 같은 순회에서 첫 행만 기억
+        fallback = None
+        for _, sheet_name, region in publisher_data:
             if normalize_publisher_name(sheet_name) == target:
-                return region.strip() or "출판지 미상"
-
-        # fallback: 원본 문자열 일치
-        for row in publisher_data:
-            if len(row) < 3:
-                continue
-            sheet_name, region = row[1], row[2]
-            if sheet_name.strip() == publisher_name.strip():
-                return region.strip() or "출판지 미상"
+                return region or "출판지 미상"
+            if fallback is None and sheet_name.strip() == raw:
+                fallback = region or "출판지 미상"
 
-        return "출판지 미상"
+        return fallback or "출판지 미상"
     except Exception as e:
-        st.write(f"⚠️ get_publisher_location 예외: {e}")
+        debug_messages.append(f"⚠️ get_publisher_location 예외: {e}")
         return "예외 발생"
 
 
@@ -103,18 +131,18 @@ def split_publisher_aliases(name):
 
 
 # --- 괄호/별칭 분리 후 두번 검색 적용한 출판지 조회 ---
-def search_publisher_location_with_alias(publisher_name, publisher_data):
+def search_publisher_location_with_alias(publisher_name, publisher_data, debug_messages):
     rep_name, aliases = split_publisher_aliases(publisher_name)
 
-    st.write(f"🔍 대표명으로 1차 검색: `{rep_name}`")
-    location = get_publisher_location(rep_name, publisher_data)
+    debug_messages.append(f"🔍 대표명으로 1차 검색: `{rep_name}`")
+    location = get_publisher_location(rep_name, publisher_data, debug_messages)
     if location != "출판지 미상":
         return location
 
     # 1차에서 미상일 경우 별칭으로 2차 검색
     for alias in aliases:
-        st.write(f"🔍 별칭으로 2차 검색 시도: `{alias}`")
-        location = get_publisher_location(alias, publisher_data)
+        debug_messages.append(f"🔍 별칭으로 2차 검색 시도: `{alias}`")
+        location = get_publisher_location(alias, publisher_data, debug_messages)
         if location != "출판지 미상":
             return location
 
@@ -122,9 +150,9 @@ def search_publisher_location_with_alias(publisher_name, publisher_data):
 
 
 # --- 구글시트(region_data)로 발행국 부호 조회 (캐시된 데이터 사용) ---
-def get_country_code_by_region(region_name, region_data):
+def get_country_code_by_region(region_name, region_data, debug_messages):
     try:
-        st.write(f"🌍 발행국 부호 찾는 중... 참조 지역: `{region_name}`")
+        debug_messages.append(f"🌍 발행국 부호 찾는 중... 참조 지역: `{region_name}`")
 
         def normalize_region_for_code(region):
             region = (region or "").strip()
@@ -135,165 +163,291 @@ def get_country_code_by_region(region_name, region_data):
             return region[:2]
 
         normalized_input = normalize_region_for_code(region_name)
-        st.write(f"🧪 정규화된 참조지역(코드대조용): `{normalized_input}`")
+        debug_messages.append(f"🧪 정규화된 참조지역(코드대조용): `{normalized_input}`")
 
-        for row in region_data:
-            if len(row) < 2:
-                continue
-            sheet_region, country_code = row[0], row[1]
+        for sheet_region, country_code in region_data:
             if normalize_region_for_code(sheet_region) == normalized_input:
-                return country_code.strip() or "xxu"
+                return country_code or "xxu"
 
         return "xxu"
     except Exception as e:
-        st.write(f"⚠️ get_country_code_by_region 예외: {e}")
+        debug_messages.append(f"⚠️ get_country_code_by_region 예외: {e}")
         return "xxu"
 
 
+# --- 300 필드 조합 (a_part: 쪽수, c_part: 크기) ---
+def build_field_300(a_part, c_part):
+    if a_part or c_part:
+        field_300 = "=300  \\\\$a"
+        if a_part:
+            field_300 += a_part
+        if c_part:
+            if a_part:
+                field_300 += f" ;$c{c_part}."
+            else:
+                field_300 += f"$c{c_part}."
+    else:
+        field_300 = "=300  \\$a1책."
+    return field_300
+
+
 # --- Aladin API: ISBN으로 도서 정보 조회 (title, author, publisher, pubyear, 245 필드) ---
+# 네트워크 오류·알라딘 오류 응답·검색 결과 없음은 예외로 올려 캐시에 남기지 않고, 정상 응답만 ISBN 단위로 캐시 (rerun 간 유지)
+@st.cache_data(max_entries=1024, show_spinner=False)
+def _search_aladin_by_isbn(isbn):
+    ttbkey = st.secrets["aladin"]["ttbkey"]
+    url = "https://www.aladin.co.kr/ttb/api/ItemLookUp.aspx"
+    params = {
+        "ttbkey": ttbkey,
+        "itemIdType": "ISBN",
+        "ItemId": isbn,
+        "output": "js",
+        "Version": "20131101",
+        # 쪽수(subInfo.itemPage)와 크기(subInfo.packing)를 같은 응답에 포함 → 300 필드용 크롤링 생략
+        "OptResult": "packing,subInfo"
+    }
+    res = SESSION.get(url, params=params, timeout=15)
+    if res.status_code != 200:
+        raise RuntimeError(f"API 요청 실패 (status: {res.status_code})")
+
+    data = orjson.loads(res.content)
+    if "errorCode" in data:
+        raise RuntimeError(f"알라딘 오류 {data['errorCode']}: {data.get('errorMessage', '')}")
+    if not data.get("item"):
+        raise LookupError(f"도서 정보를 찾을 수 없습니다. [응답: {data}]")
+
+    book = data["item"][0]
+    title = book.get("title", "제목 없음")
+    author = book.get("author", "")
+    publisher = book.get("publisher", "출판사 정보 없음")
+    pubdate = book.get("pubDate", "")
+    pubyear = pubdate[:4] if len(pubdate) >= 4 else "발행년도 없음"
+
+    authors = [a.strip() for a in author.split(",")] if author else []
+    creator_str = " ; ".join(authors) if authors else "저자 정보 없음"
+    field_245 = f"=245  10$a{title} /$c{creator_str}"
+
+    # 형태사항: API에 있는 쪽수(a_part)/크기(c_part)만 따로 반환 (빠진 쪽은 크롤링으로 채움)
+    sub_info = book.get("subInfo") or {}
+    packing = sub_info.get("packing") or {}
+    item_page = sub_info.get("itemPage")
+    width, height = packing.get("sizeWidth"), packing.get("sizeHeight")
+    a_part = f"{int(item_page)} p." if item_page else ""
+    c_part = f"{round(int(width) / 10)}x{round(int(height) / 10)} cm" if width and height else ""
+
+    return {
+        "title": title,
+        "creator": creator_str,
+        "publisher": publisher,
+        "pubyear": pubyear,
+        "245": field_245,
+        "300_a": a_part,
+        "300_c": c_part,
+        "link": book.get("link")  # 상세 페이지 링크 (크롤링 시 검색 페이지 생략)
+    }, None
+
+
 def search_aladin_by_isbn(isbn):
     try:
-        ttbkey = st.secrets["aladin"]["ttbkey"]
-        url = "https://www.aladin.co.kr/ttb/api/ItemLookUp.aspx"
-        params = {
-            "ttbkey": ttbkey,
-            "itemIdType": "ISBN",
-            "ItemId": isbn,
-            "output": "js",
-            "Version": "20131101"
-        }
-        res = requests.get(url, params=params, timeout=15)
-        if res.status_code != 200:
-            return None, f"API 요청 실패 (status: {res.status_code})"
-
-        data = res.json()
-        if "item" not in data or not data["item"]:
-            return None, f"도서 정보를 찾을 수 없습니다. [응답: {data}]"
-
-        book = data["item"][0]
-        title = book.get("title", "제목 없음")
-        author = book.get("author", "")
-        publisher = book.get("publisher", "출판사 정보 없음")
-        pubdate = book.get("pubDate", "")
-        pubyear = pubdate[:4] if len(pubdate) >= 4 else "발행년도 없음"
-
-        authors = [a.strip() for a in author.split(",")] if author else []
-        creator_str = " ; ".join(authors) if authors else "저자 정보 없음"
-        field_245 = f"=245  10$a{title} /$c{creator_str}"
-
-        return {
-            "title": title,
-            "creator": creator_str,
-            "publisher": publisher,
-            "pubyear": pubyear,
-            "245": field_245
-        }, None
-
+        return _search_aladin_by_isbn(isbn)
+    except LookupError as e:
+        return None, str(e)
     except Exception as e:
         return None, f"Aladin API 예외: {e}"
 
 
 # --- Aladin 크롤링: 형태사항(쪽수/크기) 추출 (300 필드 생성) ---
-def extract_physical_description_by_crawling(isbn):
+# 항목 한 줄을 한 번의 정규식으로 판별: 쪽수(끝이 ~쪽/~p) 우선, 아니면 크기(148*210mm)
+_FORM_ITEM_RE = re.compile(
+    r"^.*?(?P<page>\d+)\s*(?:쪽|p)\s*$"
+    r"|(?P<w>\d+)\s*[\*x×X]\s*(?P<h>\d+)\s*mm"
+)
+
+# 알라딘 검색 페이지에서 상세 페이지 URL 찾기 (API 응답에 link가 없을 때만 사용)
+@st.cache_data(max_entries=1024, show_spinner=False)
+def _find_aladin_detail_url(isbn):
+    search_url = f"https://www.aladin.co.kr/search/wsearchresult.aspx?SearchWord={isbn}"
+    res = SESSION.get(search_url, timeout=15)
+    if res.status_code != 200:
+        raise RuntimeError(f"검색 실패 (status {res.status_code})")
+
+    soup = BeautifulSoup(res.text, "lxml", parse_only=_ALADIN_SEARCH_STRAINER)
+    link_tag = soup.select_one("div.ss_book_box a.bo3")
+    if not link_tag or not link_tag.get("href"):
+        return None
+    return link_tag["href"]
+
+
+# 상세 페이지는 URL 단위로 한 번만 받아 파싱하고, 파싱된 트리를 재사용
+# (읽기 전용으로만 쓰므로 복사 없이 공유하는 cache_resource 사용)
+@st.cache_resource(max_entries=1024, show_spinner=False)
+def fetch_aladin_detail_tree(detail_url):
+    detail_res = SESSION.get(detail_url, timeout=15)
+    if detail_res.status_code != 200:
+        raise RuntimeError(f"상세페이지 요청 실패 (status {detail_res.status_code})")
+    return BeautifulSoup(detail_res.text, "lxml", parse_only=_ALADIN_FORM_STRAINER)
+
+
+# 파싱된 상세 페이지 트리에서 300 필드용 (쪽수, 크기) 추출
+def extract_physical_description_by_crawling(detail_tree):
+    form_wrap = detail_tree.select_one("div.conts_info_list1")
+    a_part = ""
+    c_part = ""
+
+    if form_wrap:
+        for item in form_wrap.stripped_strings:
+            m = _FORM_ITEM_RE.search(item)
+            if not m:
+                continue
+            # 쪽수 (~쪽, ~p)
+            if m.group("page"):
+                a_part = f"{m.group('page')} p."
+            # 크기 (mm 포함, ex. 148*210mm)
+            else:
+                width = int(m.group("w"))
+                height = int(m.group("h"))
+                w_cm = round(width / 10)
+                h_cm = round(height / 10)
+                c_part = f"{w_cm}x{h_cm} cm"
+            if a_part and c_part:
+                break
+
+    return a_part, c_part
+
+
+# 반환: ((a_part, c_part), 오류) — 실패 시 빈 값 (build_field_300이 "1책."으로 처리)
+def crawl_physical_description(isbn, detail_url=None):
     try:
-        search_url = f"https://www.aladin.co.kr/search/wsearchresult.aspx?SearchWord={isbn}"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        res = requests.get(search_url, headers=headers, timeout=15)
-        if res.status_code != 200:
-            return "=300  \\$a1책.", f"검색 실패 (status {res.status_code})"
-
-        soup = BeautifulSoup(res.text, "html.parser")
-        link_tag = soup.select_one("div.ss_book_box a.bo3")
-        if not link_tag or not link_tag.get("href"):
-            return "=300  \\$a1책.", "도서 링크를 찾을 수 없습니다."
-
-        detail_url = link_tag["href"]
-        detail_res = requests.get(detail_url, headers=headers, timeout=15)
-        if detail_res.status_code != 200:
-            return "=300  \\$a1책.", f"상세페이지 요청 실패 (status {detail_res.status_code})"
-
-        detail_soup = BeautifulSoup(detail_res.text, "html.parser")
-        form_wrap = detail_soup.select_one("div.conts_info_list1")
-        a_part = ""
-        c_part = ""
-
-        if form_wrap:
-            items = [s.strip() for s in form_wrap.stripped_strings]
-            for item in items:
-                # 쪽수 (~쪽, ~p)
-                if re.search(r"(쪽|p)\s*$", item):
-                    m = re.search(r"(\d+)\s*(쪽|p)?$", item)
-                    if m:
-                        a_part = f"{m.group(1)} p."
-                # 크기 (mm 포함, ex. 148*210mm)
-                elif "mm" in item:
-                    size_match = re.search(r"(\d+)\s*[\*x×X]\s*(\d+)\s*mm", item)
-                    if size_match:
-                        width = int(size_match.group(1))
-                        height = int(size_match.group(2))
-                        w_cm = round(width / 10)
-                        h_cm = round(height / 10)
-                        c_part = f"{w_cm}x{h_cm} cm"
-
-        if a_part or c_part:
-            field_300 = "=300  \\\\$a"
-            if a_part:
-                field_300 += a_part
-            if c_part:
-                if a_part:
-                    field_300 += f" ;$c{c_part}."
-                else:
-                    field_300 += f"$c{c_part}."
-        else:
-            field_300 = "=300  \\$a1책."
-
-        return field_300, None
-
+        detail_url = detail_url or _find_aladin_detail_url(isbn)
+        if not detail_url:
+            return ("", ""), "도서 링크를 찾을 수 없습니다."
+        return extract_physical_description_by_crawling(fetch_aladin_detail_tree(detail_url)), None
     except Exception as e:
-        return "=300  \\$a1책.", f"크롤링 예외: {e}"
+        return ("", ""), f"크롤링 예외: {e}"
 
 
 # --- KPIPA에서 ISBN으로 출판사 / 임프린트 크롤링 (원문 + 정규화) ---
-def get_publisher_name_from_isbn_kpipa(isbn):
+@st.cache_data(max_entries=1024, show_spinner=False)
+def _get_publisher_name_from_isbn_kpipa(isbn):
     search_url = "https://bnk.kpipa.or.kr/home/v3/addition/search"
     params = {"ST": isbn, "PG": 1, "PG2": 1, "DSF": "Y", "SO": "weight", "DT": "A"}
-    headers = {"User-Agent": "Mozilla/5.0"}
 
-    def normalize(name):
-        return re.sub(r"\s|\(.*?\)|주식회사|㈜|도서출판|출판사|프레스", "", name).lower()
+    res = SESSION.get(search_url, params=params, timeout=15)
+    res.raise_for_status()
+    soup = BeautifulSoup(res.text, "lxml", parse_only=_KPIPA_SEARCH_STRAINER)
+    first_result_link = soup.select_one("a.book-grid-item")
+    if not first_result_link:
+        return None, None, "❌ 검색 결과 없음 (KPIPA)"
 
-    try:
-        res = requests.get(search_url, params=params, headers=headers, timeout=15)
-        res.raise_for_status()
-        soup = BeautifulSoup(res.text, "html.parser")
-        first_result_link = soup.select_one("a.book-grid-item")
-        if not first_result_link:
-            return None, None, "❌ 검색 결과 없음 (KPIPA)"
-
-        detail_href = first_result_link.get("href")
-        detail_url = f"https://bnk.kpipa.or.kr{detail_href}"
-        detail_res = requests.get(detail_url, headers=headers, timeout=15)
-        detail_res.raise_for_status()
-        detail_soup = BeautifulSoup(detail_res.text, "html.parser")
-
-        pub_info_tag = detail_soup.find("dt", string="출판사 / 임프린트")
-        if not pub_info_tag:
-            return None, None, "❌ '출판사 / 임프린트' 항목을 찾을 수 없습니다. (KPIPA)"
-
-        dd_tag = pub_info_tag.find_next_sibling("dd")
-        if dd_tag:
-            full_text = dd_tag.get_text(strip=True)
-            publisher_name_full = full_text
-            publisher_name_part = publisher_name_full.split("/")[0].strip()
-            publisher_name_norm = normalize(publisher_name_part)
-            return publisher_name_full, publisher_name_norm, None
-
-        return None, None, "❌ 'dd' 태그에서 텍스트를 추출할 수 없습니다. (KPIPA)"
+    detail_href = first_result_link.get("href")
+    detail_url = f"https://bnk.kpipa.or.kr{detail_href}"
+    detail_res = SESSION.get(detail_url, timeout=15)
+    detail_res.raise_for_status()
+    detail_soup = BeautifulSoup(detail_res.text, "lxml", parse_only=_KPIPA_DETAIL_STRAINER)
 
+    pub_info_tag = detail_soup.find("dt", string="출판사 / 임프린트")
+    if not pub_info_tag:
+        return None, None, "❌ '출판사 / 임프린트' 항목을 찾을 수 없습니다. (KPIPA)"
+
+    dd_tag = pub_info_tag.find_next_sibling("dd")
+    if dd_tag:
+        full_text = dd_tag.get_text(strip=True)
+        publisher_name_full = full_text
+        publisher_name_part = publisher_name_full.split("/")[0].strip()
+        publisher_name_norm = normalize_publisher_name(publisher_name_part)
+        return publisher_name_full, publisher_name_norm, None
+
+    return None, None, "❌ 'dd' 태그에서 텍스트를 추출할 수 없습니다. (KPIPA)"
+
+
+def get_publisher_name_from_isbn_kpipa(isbn):
+    try:
+        return _get_publisher_name_from_isbn_kpipa(isbn)
     except Exception as e:
         return None, None, f"KPIPA 예외: {e}"
 
 
+# =========================
+# --- ISBN 1건 처리 (UI 호출 없이 결과만 반환, 스레드에서 실행) ---
+# =========================
+def _submit_with_ctx(ex, fn, *args):
+    # 작업 스레드에도 현재 Streamlit 스크립트 컨텍스트를 연결 → st.cache_data가 경고 없이 동작
+    ctx = get_script_run_ctx()
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+    return ex.submit(run)
+
+def process_isbn(isbn, publisher_data, region_data):
+    debug_messages = []
+    marc_lines = None
+
+    # 1) Aladin API / KPIPA 조회는 서로 독립적이므로 동시에 요청
+    #    (KPIPA 결과는 출판지 미상일 때만 사용)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_api = _submit_with_ctx(ex, search_aladin_by_isbn, isbn)
+        f_kpipa = _submit_with_ctx(ex, get_publisher_name_from_isbn_kpipa, isbn)
+        result, error = f_api.result()
+        if error:
+            debug_messages.append(f"❌ Aladin API 오류: {error}")
+
+        # 2) 형태사항(300): API 응답에 쪽수나 크기 중 하나라도 없으면 알라딘 페이지를 크롤링해
+        #    빠진 쪽만 채운 뒤 조합 (API 값 우선)
+        a_part = result.get("300_a", "") if result else ""
+        c_part = result.get("300_c", "") if result else ""
+        if not (a_part and c_part):
+            (crawl_a, crawl_c), err_300 = crawl_physical_description(isbn, result.get("link") if result else None)
+            if err_300:
+                debug_messages.append(f"⚠️ 형태사항 크롤링 경고: {err_300}")
+            a_part = a_part or crawl_a
+            c_part = c_part or crawl_c
+        field_300 = build_field_300(a_part, c_part)
+
+        pub_full, pub_norm, crawl_err = f_kpipa.result()
+
+    if result:
+        publisher = result["publisher"]
+        pubyear = result["pubyear"]
+
+        # 3) 출판사명 괄호/슬래시 분리 후 두 번 검색 적용하여 출판지 조회
+        location_raw = search_publisher_location_with_alias(publisher, publisher_data, debug_messages)
+        location_norm_for_display = normalize_publisher_location_for_display(location_raw)
+
+        # 4) 추가 검색: **출판지 미상인 경우에만** KPIPA에서 가져온 출판사명 사용
+        if location_raw == "출판지 미상":
+            debug_messages.append("🔔 출판지 미상 — KPIPA 추가 검색 결과 사용")
+            if crawl_err:
+                debug_messages.append(f"❌ KPIPA 크롤링 실패: {crawl_err}")
+            else:
+                debug_messages.append(f"🔍 KPIPA 크롤링 원문('출판사 / 임프린트'): {pub_full}")
+                debug_messages.append(f"🧪 KPIPA에서 추출한 정규화된 출판사명: {pub_norm}")
+
+                # KPIPA에서 정규화한 출판사명으로 재검색 (publisher_data 사용)
+                new_location = get_publisher_location(pub_norm, publisher_data, debug_messages)
+                new_location_norm_display = normalize_publisher_location_for_display(new_location)
+                debug_messages.append(f"🏙️ KPIPA 기반 재검색 결과: {new_location} / 정규화: {new_location_norm_display}")
+
+                if new_location and new_location not in ("출판지 미상", "예외 발생"):
+                    location_raw = new_location
+                    location_norm_for_display = new_location_norm_display
+
+        # 5) 발행국 부호 조회 (region_data 사용)
+        country_code = get_country_code_by_region(location_raw, region_data, debug_messages)
+
+        # ▶ 출력용: 008, 245, 260, 300
+        marc_lines = [
+            f"=008  \\$a{country_code}",
+            result["245"],
+            f"=260  \\$a{location_norm_for_display} :$b{publisher},$c{pubyear}.",
+            field_300,
+        ]
+
+    else:
+        debug_messages.append("⚠️ Aladin에서 도서 정보를 가져오지 못했습니다.")
+
+    return {"isbn": isbn, "marc_lines": marc_lines, "debug_messages": debug_messages}
+
+
 # =========================
 # --- Streamlit UI 부분 ---
 # =========================
@@ -307,64 +461,23 @@ if isbn_input:
     # 구글 시트 데이터 한번만 로드 (캐시)
     publisher_data, region_data = load_publisher_db()
 
-    for idx, isbn in enumerate(isbn_list, start=1):
-        st.markdown(f"---\n### 📘 {idx}. ISBN: `{isbn}`")
-        debug_messages = []
+    # ISBN별 네트워크 조회는 서로 독립적이므로 스레드풀로 동시에 처리
+    with st.spinner("🔍 도서 정보 검색 중..."):
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            futures = [_submit_with_ctx(ex, process_isbn, i, publisher_data, region_data) for i in isbn_list]
+            results = [f.result() for f in futures]
 
-        # 1) Aladin API로 도서 정보 조회
-        with st.spinner("🔍 도서 정보 검색 중..."):
-            result, error = search_aladin_by_isbn(isbn)
-        if error:
-            debug_messages.append(f"❌ Aladin API 오류: {error}")
+    # ▶ 출력은 모든 작업이 끝난 뒤 입력 순서대로 (Streamlit 호출은 메인 스레드에서만)
+    for idx, res in enumerate(results, start=1):
+        st.markdown(f"---\n### 📘 {idx}. ISBN: `{res['isbn']}`")
 
-        # 2) 형태사항(300) 크롤링
-        with st.spinner("📐 형태사항 크롤링 중..."):
-            field_300, err_300 = extract_physical_description_by_crawling(isbn)
-        if err_300:
-            debug_messages.append(f"⚠️ 형태사항 크롤링 경고: {err_300}")
-
-        if result:
-            publisher = result["publisher"]
-            pubyear = result["pubyear"]
-
-            # 3) 출판사명 괄호/슬래시 분리 후 두 번 검색 적용하여 출판지 조회
-            location_raw = search_publisher_location_with_alias(publisher, publisher_data)
-            location_norm_for_display = normalize_publisher_location_for_display(location_raw)
-
-            # 4) 추가 크롤링: **출판지 미상인 경우에만** KPIPA에서 출판사명 크롤링 시도
-            if location_raw == "출판지 미상":
-                debug_messages.append("🔔 출판지 미상 — KPIPA 추가 검색 실행")
-                pub_full, pub_norm, crawl_err = get_publisher_name_from_isbn_kpipa(isbn)
-                if crawl_err:
-                    debug_messages.append(f"❌ KPIPA 크롤링 실패: {crawl_err}")
-                else:
-                    debug_messages.append(f"🔍 KPIPA 크롤링 원문('출판사 / 임프린트'): {pub_full}")
-                    debug_messages.append(f"🧪 KPIPA에서 추출한 정규화된 출판사명: {pub_norm}")
-
-                    # KPIPA에서 정규화한 출판사명으로 재검색 (publisher_data 사용)
-                    new_location = get_publisher_location(pub_norm, publisher_data)
-                    new_location_norm_display = normalize_publisher_location_for_display(new_location)
-                    debug_messages.append(f"🏙️ KPIPA 기반 재검색 결과: {new_location} / 정규화: {new_location_norm_display}")
-
-                    if new_location and new_location not in ("출판지 미상", "예외 발생"):
-                        location_raw = new_location
-                        location_norm_for_display = new_location_norm_display
-
-            # 5) 발행국 부호 조회 (region_data 사용)
-            country_code = get_country_code_by_region(location_raw, region_data)
-
-            # ▶ 출력: 008, 245, 260, 300
+        if res["marc_lines"]:
             with st.container():
-                st.code(f"=008  \\$a{country_code}", language="text")
-                st.code(result["245"], language="text")
-                st.code(f"=260  \\$a{location_norm_for_display} :$b{publisher},$c{pubyear}.", language="text")
-                st.code(field_300, language="text")
-
-        else:
-            debug_messages.append("⚠️ Aladin에서 도서 정보를 가져오지 못했습니다.")
+                for line in res["marc_lines"]:
+                    st.code(line, language="text")
 
         # ▶ 디버깅 메시지 출력
-        if debug_messages:
+        if res["debug_messages"]:
             with st.expander("🛠️ 디버깅 및 경고 메시지"):
-                for m in debug_messages:
+                for m in res["debug_messages"]:
                     st.write(m)
@@ -1,15 +1,101 @@
 import streamlit as st
-import requests
+import aiohttp
+import asyncio
+from aiohttp_client_cache import CachedSession, SQLiteBackend
 import re
-from bs4 import BeautifulSoup
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import pandas as pd
+import unicodedata
+import orjson
+from bs4 import BeautifulSoup, SoupStrainer
+import lxml.html
+import ahocorasick
+from rapidfuzz import fuzz, process as fuzz_process
 import io
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+
+# =========================
+# --- 비동기 HTTP 설정 (알라딘/KPIPA/문체부 요청을 ISBN 여러 건에 걸쳐 동시에 처리) ---
+# =========================
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0"}
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=15)
+MAX_CONCURRENT_ISBNS = 10   # 동시에 처리할 ISBN 수 (Semaphore)
+MAX_CONNECTIONS = 20        # 세션 전체 동시 커넥션 수 (TCPConnector limit)
+HTTP_CACHE_NAME = "http_cache"   # 알라딘 상세 페이지/KPIPA/문체부 GET 응답 디스크 캐시 (SQLite, 세션 간 재사용)
+HTTP_CACHE_EXPIRE = 86400        # 디스크 캐시 유지 시간 (초)
+
+def async_lru_cache(maxsize=1024):
+    """
+    코루틴용 lru_cache: 첫 번째 인자(ISBN/링크/출판사명)만 키로 쓰고 session 등 나머지 인자는 제외.
+    같은 키로 동시에 들어온 호출은 먼저 시작한 요청 하나를 함께 기다림.
+    예외는 캐시하지 않으므로 네트워크 오류 후 재시도하면 다시 요청함.
+    """
+    def decorator(func):
+        cache = OrderedDict()   # key -> Future (완료된 값 또는 진행 중인 요청)
+        lock = threading.Lock()
+
+        @wraps(func)
+        async def wrapper(key, *args, **kwargs):
+            with lock:
+                fut = cache.get(key)
+                owner = fut is None
+                if owner:
+                    fut = asyncio.get_running_loop().create_future()
+                    cache[key] = fut
+                    if len(cache) > maxsize:
+                        cache.popitem(last=False)
+                else:
+                    cache.move_to_end(key)
+            if not owner:
+                return fut.result() if fut.done() else await fut
+            try:
+                value = await func(key, *args, **kwargs)
+            except BaseException as e:
+                with lock:
+                    if cache.get(key) is fut:
+                        del cache[key]
+                if isinstance(e, asyncio.CancelledError):
+                    fut.cancel()
+                else:
+                    fut.set_exception(e)
+                    fut.exception()   # 기다리는 쪽이 없어도 미처리 예외 경고가 남지 않도록 소비
+                raise
+            fut.set_result(value)
+            return value
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+# =========================
+# --- 파싱 대상 노드만 트리로 만드는 SoupStrainer (lxml 파서와 함께 사용) ---
+# =========================
+_ALADIN_DETAIL_CLASSES = ["Ere_bo_title", "Ere_sub1_title", "Ere_prod_mconts_R", "conts_info_list1"]
+_ALADIN_DETAIL_STRAINER = SoupStrainer(class_=_ALADIN_DETAIL_CLASSES)
+_KPIPA_SEARCH_STRAINER = SoupStrainer("a", class_="book-grid-item")
+_KPIPA_DETAIL_STRAINER = SoupStrainer(["dt", "dd"])
 
 # =========================
 # --- 알라딘 상세 페이지 파싱 (형태사항) ---
 # =========================
+_ILLUSTRATION_KEYWORD_GROUPS = {
+    "천연색삽화": ["삽화", "일러스트", "일러스트레이션", "illustration", "그림"],
+    "삽화": ["흑백 삽화", "흑백 일러스트", "흑백 일러스트레이션", "흑백 그림"],
+    "사진": ["사진", "포토", "photo", "화보"],
+    "도표": ["도표", "차트", "그래프"],
+    "지도": ["지도", "지도책"],
+}
+_ILLUSTRATION_KW_TO_LABEL = {
+    kw: label for label, keywords in _ILLUSTRATION_KEYWORD_GROUPS.items() for kw in keywords
+}
+# 키워드 전체를 Aho–Corasick 오토마톤 하나로 → 텍스트 1회 순회로 겹치는 키워드("흑백 삽화"/"삽화")까지 모두 매칭
+_ILLUSTRATION_AUTOMATON = ahocorasick.Automaton()
+for _kw, _label in _ILLUSTRATION_KW_TO_LABEL.items():
+    _ILLUSTRATION_AUTOMATON.add_word(_kw, _label)
+_ILLUSTRATION_AUTOMATON.make_automaton()
+
 def detect_illustrations(text: str):
     """
     주어진 텍스트에서 삽화/사진/도표/지도 가능성을 감지
@@ -18,48 +104,46 @@ def detect_illustrations(text: str):
     if not text:
         return False, None
 
-    keyword_groups = {
-        "천연색삽화": ["삽화", "일러스트", "일러스트레이션", "illustration", "그림"],
-        "삽화": ["흑백 삽화", "흑백 일러스트", "흑백 일러스트레이션", "흑백 그림"],
-        "사진": ["사진", "포토", "photo", "화보"],
-        "도표": ["도표", "차트", "그래프"],
-        "지도": ["지도", "지도책"],
-    }
-
-    found_labels = set()
-
-    for label, keywords in keyword_groups.items():
-        if any(kw in text for kw in keywords):
-            found_labels.add(label)
+    found_labels = {label for _, label in _ILLUSTRATION_AUTOMATON.iter(text)}
 
     if found_labels:
         return True, ", ".join(sorted(found_labels))
     else:
         return False, None
 
-def parse_aladin_physical_book_info(html):
+# 형태사항 항목 한 줄을 한 번의 정규식으로 판별: 쪽수(…쪽/…p, 첫 숫자) 우선, 아니면 크기(가로x세로, mm 포함)
+_FORM_ITEM_RE = re.compile(
+    r"^\D*(?P<page>\d+).*(?:쪽|p)\s*$"
+    r"|(?P<w>\d+)\s*[\*x×X]\s*(?P<h>\d+)(?=.*mm)"
+)
+
+def parse_aladin_physical_book_info(soup):
     """
-    알라딘 상세 페이지 HTML에서 300 필드 파싱
+    알라딘 상세 페이지(fetch_aladin_detail_tree로 파싱된 트리)에서 300 필드 파싱
     """
-    soup = BeautifulSoup(html, "html.parser")
+    # 필요한 노드(제목/부제/책소개/형태사항)를 한 번의 순회로 모아 "태그.클래스"로 분류
+    nodes = {}
+    for tag in soup.find_all(class_=_ALADIN_DETAIL_CLASSES):
+        for cls in tag.get("class", []):
+            nodes.setdefault(f"{tag.name}.{cls}", tag)
 
     # -------------------------------
     # 제목, 부제, 책소개
     # -------------------------------
-    title = soup.select_one("span.Ere_bo_title")
-    subtitle = soup.select_one("span.Ere_sub1_title")
+    title = nodes.get("span.Ere_bo_title")
+    subtitle = nodes.get("span.Ere_sub1_title")
     title_text = title.get_text(strip=True) if title else ""
     subtitle_text = subtitle.get_text(strip=True) if subtitle else ""
 
     description = None
-    desc_tag = soup.select_one("div.Ere_prod_mconts_R")
+    desc_tag = nodes.get("div.Ere_prod_mconts_R")
     if desc_tag:
         description = desc_tag.get_text(" ", strip=True)
 
     # -------------------------------
     # 형태사항
     # -------------------------------
-    form_wrap = soup.select_one("div.conts_info_list1")
+    form_wrap = nodes.get("div.conts_info_list1")
     a_part = ""
     b_part = ""
     c_part = ""
@@ -67,26 +151,26 @@ def parse_aladin_physical_book_info(html):
     size_value = None
 
     if form_wrap:
-        form_items = [item.strip() for item in form_wrap.stripped_strings if item.strip()]
-        for item in form_items:
-            if re.search(r"(쪽|p)\s*$", item):
-                page_match = re.search(r"\d+", item)
-                if page_match:
-                    page_value = int(page_match.group())
-                    a_part = f"{page_match.group()} p."
-            elif "mm" in item:
-                size_match = re.search(r"(\d+)\s*[\*x×X]\s*(\d+)", item)
-                if size_match:
-                    width = int(size_match.group(1))
-                    height = int(size_match.group(2))
-                    size_value = f"{width}x{height}mm"
-                    if width == height or width > height or width < height / 2:
-                        w_cm = round(width / 10)
-                        h_cm = round(height / 10)
-                        c_part = f"{w_cm}x{h_cm} cm"
-                    else:
-                        h_cm = round(height / 10)
-                        c_part = f"{h_cm} cm"
+        for item in form_wrap.stripped_strings:
+            m = _FORM_ITEM_RE.search(item)
+            if not m:
+                continue
+            if m.group("page"):
+                page_value = int(m.group("page"))
+                a_part = f"{m.group('page')} p."
+            else:
+                width = int(m.group("w"))
+                height = int(m.group("h"))
+                size_value = f"{width}x{height}mm"
+                if width == height or width > height or width < height / 2:
+                    w_cm = round(width / 10)
+                    h_cm = round(height / 10)
+                    c_part = f"{w_cm}x{h_cm} cm"
+                else:
+                    h_cm = round(height / 10)
+                    c_part = f"{h_cm} cm"
+            if a_part and c_part:
+                break
 
     # -------------------------------
     # 삽화 감지 (제목 + 부제 + 책소개 전체)
@@ -120,11 +204,18 @@ def parse_aladin_physical_book_info(html):
     }
 
 
-def search_aladin_detail_page(link):
-    try:
-        res = requests.get(link, timeout=15)
+# 상세 페이지는 링크 단위로 한 번만 받아 파싱하고, 파싱된 트리를 재사용
+@async_lru_cache(maxsize=1024)
+async def fetch_aladin_detail_tree(link, session):
+    async with session.get(link) as res:
         res.raise_for_status()
-        return parse_aladin_physical_book_info(res.text), None
+        html = await res.text()
+    return await asyncio.to_thread(BeautifulSoup, html, "lxml", parse_only=_ALADIN_DETAIL_STRAINER)
+
+
+async def search_aladin_detail_page(link, session):
+    try:
+        return parse_aladin_physical_book_info(await fetch_aladin_detail_tree(link, session)), None
     except Exception as e:
         return {
             "300": "=300  \\$a1책. [상세 페이지 파싱 오류]",
@@ -137,75 +228,118 @@ def search_aladin_detail_page(link):
 # =========================
 # --- 구글시트 로드 & 캐시 관리 ---
 # =========================
-@st.cache_data(ttl=3600)
+# 시트 조회 + 인덱스 생성까지 캐시하고, 검색에 쓰는 딕셔너리만 반환 (재실행 시 역직렬화 비용 최소화)
+@st.cache_data(ttl=3600, show_spinner=False)
 def load_publisher_db():
+    # 시트 조회용 모듈은 캐시가 비었을 때만 필요하므로 여기서 불러옴 (재실행 시 시작 시간 단축)
+    import gspread
+    import pandas as pd
+    from oauth2client.service_account import ServiceAccountCredentials
+
     creds = ServiceAccountCredentials.from_json_keyfile_dict(st.secrets["gspread"], 
                                                              ["https://spreadsheets.google.com/feeds",
                                                               "https://www.googleapis.com/auth/drive"])
     client = gspread.authorize(creds)
     sh = client.open("출판사 DB")
+
+    # 시트별 get_all_values() 대신 필요한 범위(헤더 제외)를 한 번의 batch 요청으로 가져옴
+    imprint_titles = [ws.title for ws in sh.worksheets() if ws.title.startswith("IM_")]
+    ranges = ["'KPIPA_PUB_REG'!A2:D", "'008'!A2:B"] + [f"'{title}'!A2:A" for title in imprint_titles]
+    value_ranges = sh.values_batch_get(ranges)["valueRanges"]
+    # batch 응답은 뒤쪽 빈 셀이 잘려서 오므로 필요한 열 수만큼 채워서 사용
+    pub_rows, region_rows, *imprint_sheets = [vr.get("values", []) for vr in value_ranges]
     
     # KPIPA_PUB_REG: 번호, 출판사명, 주소, 전화번호 → 출판사명, 주소만 사용
-    pub_rows = sh.worksheet("KPIPA_PUB_REG").get_all_values()[1:]
-    pub_rows_filtered = [row[1:3] for row in pub_rows]  # 출판사명, 주소
-    publisher_data = pd.DataFrame(pub_rows_filtered, columns=["출판사명", "주소"])
+    pub_rows_filtered = [(row + ["", "", ""])[1:3] for row in pub_rows]  # 출판사명, 주소
+    pub_df = pd.DataFrame(pub_rows_filtered, columns=["출판사명", "주소"])
+    # 정규화는 로드 시 한 번만 → {정규화된 출판사명: 주소} (같은 정규화명이면 첫 행 우선)
+    pub_df["출판사명_norm"] = pub_df["출판사명"].map(normalize_publisher_name)
+    pub_df = pub_df.drop_duplicates("출판사명_norm")
+    publisher_data = dict(zip(pub_df["출판사명_norm"], pub_df["주소"]))
+    publisher_buckets = build_publisher_buckets(publisher_data)
     
     # 008: 발행국 발행국 부호 → 첫 2열만
-    region_rows = sh.worksheet("008").get_all_values()[1:]
-    region_rows_filtered = [row[:2] for row in region_rows]
+    region_rows_filtered = [(row + ["", ""])[:2] for row in region_rows]
     region_data = pd.DataFrame(region_rows_filtered, columns=["발행국", "발행국 부호"])
+    region_code_index = build_region_code_index(region_data)
     
-    # IM_* 시트: 출판사/임프린트 하나의 칼럼
-    imprint_frames = []
-    for ws in sh.worksheets():
-        if ws.title.startswith("IM_"):
-            data = ws.get_all_values()[1:]
-            imprint_frames.extend([row[0] for row in data if row])
-    imprint_data = pd.DataFrame(imprint_frames, columns=["임프린트"])
+    # IM_* 시트: 출판사/임프린트 하나의 칼럼 → {정규화된 임프린트명: 출판사명} (첫 행 우선)
+    imprint_data = {}
+    for data in imprint_sheets:
+        for row in data:
+            if not row or "/" not in row[0]:
+                continue
+            pub_part, imprint_part = [p.strip() for p in row[0].split("/", 1)]
+            if imprint_part:
+                imprint_data.setdefault(normalize_publisher_name(imprint_part), pub_part)
     
-    return publisher_data, region_data, imprint_data
+    return publisher_data, publisher_buckets, imprint_data, region_code_index
 
 # =========================
 # --- 알라딘 API ---
 # =========================
-def search_aladin_by_isbn(isbn):
-    try:
-        ttbkey = st.secrets["aladin"]["ttbkey"]
-        url = "https://www.aladin.co.kr/ttb/api/ItemLookUp.aspx"
-        params = {"ttbkey": ttbkey, "itemIdType": "ISBN", "ItemId": isbn, 
-                  "output": "js", "Version": "20131101"}
-        res = requests.get(url, params=params, timeout=15)
+# 네트워크 오류·알라딘 오류 응답·검색 결과 없음은 예외로 올려 캐시에 남기지 않고, 정상 응답만 ISBN 단위로 캐시
+@async_lru_cache(maxsize=1024)
+async def _search_aladin_by_isbn(isbn, session):
+    ttbkey = st.secrets["aladin"]["ttbkey"]
+    url = "https://www.aladin.co.kr/ttb/api/ItemLookUp.aspx"
+    params = {"ttbkey": ttbkey, "itemIdType": "ISBN", "ItemId": isbn, 
+              "output": "js", "Version": "20131101"}
+    async with session.get(url, params=params) as res:
         res.raise_for_status()
-        data = res.json()
-        if "item" not in data or not data["item"]:
-            return None, None, f"도서 정보를 찾을 수 없습니다. [응답: {data}]"
-        book = data["item"][0]
-        title = book.get("title", "제목 없음")
-        author = book.get("author", "")
-        publisher = book.get("publisher", "출판사 정보 없음")
-        pubdate = book.get("pubDate", "")
-        pubyear = pubdate[:4] if len(pubdate) >= 4 else "발행년도 없음"
-        authors = [a.strip() for a in author.split(",")] if author else []
-        creator_str = " ; ".join(authors) if authors else "저자 정보 없음"
-        field_245 = f"=245  10$a{title} /$c{creator_str}"
-        link = book.get("link")  # 상세 페이지 링크 추출
-        
-        return {"title": title, "creator": creator_str, "publisher": publisher, "pubyear": pubyear, "245": field_245}, link, None
+        data = orjson.loads(await res.read())
+    if "errorCode" in data:
+        raise RuntimeError(f"알라딘 오류 {data['errorCode']}: {data.get('errorMessage', '')}")
+    if not data.get("item"):
+        raise LookupError(f"도서 정보를 찾을 수 없습니다. [응답: {data}]")
+    book = data["item"][0]
+    title = book.get("title", "제목 없음")
+    author = book.get("author", "")
+    publisher = book.get("publisher", "출판사 정보 없음")
+    pubdate = book.get("pubDate", "")
+    pubyear = pubdate[:4] if len(pubdate) >= 4 else "발행년도 없음"
+    authors = [a.strip() for a in author.split(",")] if author else []
+    creator_str = " ; ".join(authors) if authors else "저자 정보 없음"
+    field_245 = f"=245  10$a{title} /$c{creator_str}"
+    link = book.get("link")  # 상세 페이지 링크 추출
+    
+    return {"title": title, "creator": creator_str, "publisher": publisher, "pubyear": pubyear, "245": field_245}, link, None
+
+async def search_aladin_by_isbn(isbn, session):
+    try:
+        return await _search_aladin_by_isbn(isbn, session)
+    except LookupError as e:
+        return None, None, str(e)
     except Exception as e:
         return None, None, f"Aladin API 예외: {e}"
 
 # =========================
 # --- 정규화 함수 ---
 # =========================
+# 같은 출판사명이 ISBN마다 반복되므로 순수 함수인 정규화 결과를 캐시
+_PUBLISHER_NOISE_RE = re.compile(r"\s|\(.*?\)|주식회사|㈜|도서출판|출판사")
+_KPIPA_NOISE_RE = re.compile(r"\s|\(.*?\)|주식회사|㈜|도서출판|출판사|프레스")
+_STAGE2_NOISE_RE = re.compile(r"(주니어|JUNIOR|어린이|키즈|북스|아이세움|프레스)", re.IGNORECASE)
+_STAGE2_ENG_TO_KOR = [
+    (re.compile(eng, re.IGNORECASE), kor)
+    for eng, kor in {"springer": "스프링거", "cambridge": "케임브리지", "oxford": "옥스포드"}.items()
+]
+
+@lru_cache(maxsize=8192)
 def normalize_publisher_name(name):
-    return re.sub(r"\s|\(.*?\)|주식회사|㈜|도서출판|출판사", "", name).lower()
+    # NFKC로 전각/반각·호환 문자(（）, ㈜ 등)를 먼저 통일 → DB 인덱스와 검색어가 같은 규칙으로 정규화됨
+    return _PUBLISHER_NOISE_RE.sub("", unicodedata.normalize("NFKC", name)).casefold()
+
+@lru_cache(maxsize=4096)
+def normalize_kpipa_publisher_name(name):
+    return _KPIPA_NOISE_RE.sub("", name).lower()
 
+@lru_cache(maxsize=4096)
 def normalize_stage2(name):
     name = normalize_publisher_name(name)
-    name = re.sub(r"(주니어|JUNIOR|어린이|키즈|북스|아이세움|프레스)", "", name, flags=re.IGNORECASE)
-    eng_to_kor = {"springer": "스프링거", "cambridge": "케임브리지", "oxford": "옥스포드"}
-    for eng, kor in eng_to_kor.items():
-        name = re.sub(eng, kor, name, flags=re.IGNORECASE)
+    name = _STAGE2_NOISE_RE.sub("", name)
+    for eng_re, kor in _STAGE2_ENG_TO_KOR:
+        name = eng_re.sub(kor, name)
     return name.strip().lower()
 
 def split_publisher_aliases(name):
@@ -224,6 +358,20 @@ def split_publisher_aliases(name):
         rep_name = name_no_brackets
     return rep_name, aliases
 
+@dataclass(frozen=True, slots=True)
+class NormalizedPub:
+    raw: str                 # KPIPA(또는 API) 출판사명
+    rep: str                 # 괄호/슬래시 제거한 대표 출판사명
+    aliases: tuple           # 괄호·슬래시 안의 별칭들
+    stage2: str              # 2차 정규화 이름
+
+@lru_cache(maxsize=4096)
+def normalize_publisher_for_lookup(publisher_norm):
+    """단계별 검색에 쓰는 출판사명 변형을 ISBN당 한 번만 계산 (같은 출판사면 캐시 재사용)"""
+    rep_name, aliases = split_publisher_aliases(publisher_norm)
+    return NormalizedPub(raw=publisher_norm, rep=rep_name, aliases=tuple(aliases),
+                         stage2=normalize_stage2(publisher_norm))
+
 def normalize_publisher_location_for_display(location_name):
     if not location_name or location_name in ("출판지 미상", "[예외] 발행지미상"):
         return location_name
@@ -241,18 +389,62 @@ def normalize_publisher_location_for_display(location_name):
 # =========================
 # --- KPIPA DB 검색 보조 함수 ---
 # =========================
+PUBLISHER_FUZZY_CUTOFF = 88   # 모든 정확 매칭 단계 실패 후 유사 매칭으로 인정할 최소 점수 (fuzz.ratio)
+_CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+
+def publisher_bucket_key(name):
+    """(첫 글자 초성, 길이 // 4): 유사 매칭 후보를 미리 좁히는 버킷 키 (한글이 아니면 첫 글자 그대로)"""
+    if not name:
+        return "", 0
+    head = name[0]
+    if "가" <= head <= "힣":
+        head = _CHOSUNG[(ord(head) - 0xAC00) // 588]
+    return head, len(name) // 4
+
+def build_publisher_buckets(publisher_data):
+    """정규화된 출판사명을 버킷 키별 리스트로 묶음 {(초성, 길이//4): [출판사명, ...]}"""
+    buckets = {}
+    for name in publisher_data:
+        buckets.setdefault(publisher_bucket_key(name), []).append(name)
+    return buckets
+
 def search_publisher_location_with_alias(name, publisher_data):
     debug_msgs = []
     if not name:
         return "출판지 미상", ["❌ 검색 실패: 입력된 출판사명이 없음"]
     norm_name = normalize_publisher_name(name)
-    candidates = publisher_data[publisher_data["출판사명"].apply(lambda x: normalize_publisher_name(x)) == norm_name]
-    if not candidates.empty:
-        address = candidates.iloc[0]["주소"]
+    address = publisher_data.get(norm_name)
+    if address:
         debug_msgs.append(f"✅ KPIPA DB 매칭 성공: {name} → {address}")
         return address, debug_msgs
-    else:
-        debug_msgs.append(f"❌ KPIPA DB 매칭 실패: {name}")
+    debug_msgs.append(f"❌ KPIPA DB 매칭 실패: {name}")
+    return "출판지 미상", debug_msgs
+
+def search_publisher_location_fuzzy(names, publisher_data, publisher_buckets=None):
+    """
+    정확 매칭(KPIPA·별칭·IM·2차 정규화)이 모두 실패했을 때만 쓰는 마지막 유사 매칭 (문체부 조회 전)
+    fuzz.ratio는 전체 문자열 기준이라 '길벗' vs '길벗스쿨'처럼 짧은 이름이 긴 이름에 포함된 경우는 걸러짐
+    """
+    debug_msgs = []
+    for name in dict.fromkeys(n for n in names if n):
+        norm_name = normalize_publisher_name(name)
+        if not norm_name:
+            continue
+        # 버킷이 있으면 같은 첫 글자 초성 + 비슷한 길이(±1 버킷) 후보만 비교 (rapidfuzz, C++ 한 번 호출)
+        if publisher_buckets is None:
+            candidates = publisher_data.keys()
+        else:
+            head, size = publisher_bucket_key(norm_name)
+            candidates = [c for s in (size - 1, size, size + 1) for c in publisher_buckets.get((head, s), ())]
+        best = fuzz_process.extractOne(norm_name, candidates, scorer=fuzz.ratio,
+                                       score_cutoff=PUBLISHER_FUZZY_CUTOFF)
+        if best:
+            matched_name, score, _ = best
+            address = publisher_data[matched_name]
+            if address:
+                debug_msgs.append(f"⚠️ KPIPA DB 유사(fuzzy) 매칭: {name} → {matched_name} ({score:.0f}점) → {address}")
+                return address, debug_msgs
+        debug_msgs.append(f"❌ KPIPA DB 유사(fuzzy) 매칭 실패: {name}")
     return "출판지 미상", debug_msgs
 
 # =========================
@@ -261,55 +453,50 @@ def search_publisher_location_with_alias(name, publisher_data):
 def find_main_publisher_from_imprints(rep_name, imprint_data, publisher_data):
     """
     IM_* 시트에서 임프린트명을 검색하고, KPIPA DB에서 해당 출판사명으로 주소를 반환
+    imprint_data: load_publisher_db()가 만든 {정규화된 임프린트명: 출판사명} 딕셔너리
     """
-    norm_rep = normalize_publisher_name(rep_name)
-    for full_text in imprint_data["임프린트"]:
-        if "/" in full_text:
-            pub_part, imprint_part = [p.strip() for p in full_text.split("/", 1)]
-        else:
-            pub_part, imprint_part = full_text.strip(), None
-
-        if imprint_part:
-            norm_imprint = normalize_publisher_name(imprint_part)
-            if norm_imprint == norm_rep:
-                # KPIPA DB에서 pub_part를 검색
-                location, debug_msgs = search_publisher_location_with_alias(pub_part, publisher_data)
-                return location, debug_msgs
+    pub_part = imprint_data.get(normalize_publisher_name(rep_name))
+    if pub_part:
+        # KPIPA DB에서 pub_part를 검색
+        return search_publisher_location_with_alias(pub_part, publisher_data)
     return None, [f"❌ IM DB 검색 실패: 매칭되는 임프린트 없음 ({rep_name})"]
 
     
 # =========================
 # --- KPIPA 페이지 검색 ---
 # =========================
-def get_publisher_name_from_isbn_kpipa(isbn):
+@async_lru_cache(maxsize=1024)
+async def _get_publisher_name_from_isbn_kpipa(isbn, session):
     search_url = "https://bnk.kpipa.or.kr/home/v3/addition/search"
     params = {"ST": isbn, "PG": 1, "PG2": 1, "DSF": "Y", "SO": "weight", "DT": "A"}
-    headers = {"User-Agent": "Mozilla/5.0"}
-    def normalize(name):
-        return re.sub(r"\s|\(.*?\)|주식회사|㈜|도서출판|출판사|프레스", "", name).lower()
-    try:
-        res = requests.get(search_url, params=params, headers=headers, timeout=15)
+    async with session.get(search_url, params=params) as res:
         res.raise_for_status()
-        soup = BeautifulSoup(res.text, "html.parser")
-        first_result_link = soup.select_one("a.book-grid-item")
-        if not first_result_link:
-            return None, None, "❌ 검색 결과 없음 (KPIPA)"
-        detail_href = first_result_link.get("href")
-        detail_url = f"https://bnk.kpipa.or.kr{detail_href}"
-        detail_res = requests.get(detail_url, headers=headers, timeout=15)
+        html = await res.text()
+    soup = await asyncio.to_thread(BeautifulSoup, html, "lxml", parse_only=_KPIPA_SEARCH_STRAINER)
+    first_result_link = soup.select_one("a.book-grid-item")
+    if not first_result_link:
+        return None, None, "❌ 검색 결과 없음 (KPIPA)"
+    detail_href = first_result_link.get("href")
+    detail_url = f"https://bnk.kpipa.or.kr{detail_href}"
+    async with session.get(detail_url) as detail_res:
         detail_res.raise_for_status()
-        detail_soup = BeautifulSoup(detail_res.text, "html.parser")
-        pub_info_tag = detail_soup.find("dt", string="출판사 / 임프린트")
-        if not pub_info_tag:
-            return None, None, "❌ '출판사 / 임프린트' 항목을 찾을 수 없습니다. (KPIPA)"
-        dd_tag = pub_info_tag.find_next_sibling("dd")
-        if dd_tag:
-            full_text = dd_tag.get_text(strip=True)
-            publisher_name_full = full_text
-            publisher_name_part = publisher_name_full.split("/")[0].strip()
-            publisher_name_norm = normalize(publisher_name_part)
-            return publisher_name_full, publisher_name_norm, None
-        return None, None, "❌ 'dd' 태그에서 텍스트를 추출할 수 없습니다. (KPIPA)"
+        detail_html = await detail_res.text()
+    detail_soup = await asyncio.to_thread(BeautifulSoup, detail_html, "lxml", parse_only=_KPIPA_DETAIL_STRAINER)
+    pub_info_tag = detail_soup.find("dt", string="출판사 / 임프린트")
+    if not pub_info_tag:
+        return None, None, "❌ '출판사 / 임프린트' 항목을 찾을 수 없습니다. (KPIPA)"
+    dd_tag = pub_info_tag.find_next_sibling("dd")
+    if dd_tag:
+        full_text = dd_tag.get_text(strip=True)
+        publisher_name_full = full_text
+        publisher_name_part = publisher_name_full.split("/")[0].strip()
+        publisher_name_norm = normalize_kpipa_publisher_name(publisher_name_part)
+        return publisher_name_full, publisher_name_norm, None
+    return None, None, "❌ 'dd' 태그에서 텍스트를 추출할 수 없습니다. (KPIPA)"
+
+async def get_publisher_name_from_isbn_kpipa(isbn, session):
+    try:
+        return await _get_publisher_name_from_isbn_kpipa(isbn, session)
     except Exception as e:
         return None, None, f"KPIPA 예외: {e}"
 
@@ -317,24 +504,32 @@ def get_publisher_name_from_isbn_kpipa(isbn):
 # ----발행국 부호 찾기-----
 # =========================
 
-def get_country_code_by_region(region_name, region_data):
+# 도(道) 이름은 첫 글자 한 번 비교로 먼저 거르고, 두 글자 비교는 그 다음에만 수행
+_PROVINCE_HEADS = frozenset(("전", "충", "경"))
+_PROVINCE_WORDS = frozenset(("전라", "충청", "경상"))
+
+def normalize_region_for_code(region):
+    region = (region or "").strip()
+    if region[:1] in _PROVINCE_HEADS and region[:2] in _PROVINCE_WORDS:
+        return region[0] + (region[2] if len(region) > 2 else "")
+    return region[:2]
+
+def build_region_code_index(region_data):
+    """
+    region_data(발행국, 발행국 부호)를 {정규화된 지역명: 발행국 부호} 딕셔너리로 변환 (시트 순서상 첫 행 우선)
+    """
+    region_code_index = {}
+    for region, code in zip(region_data["발행국"], region_data["발행국 부호"]):
+        region_code_index.setdefault(normalize_region_for_code(region), (code or "").strip() or "xxu")
+    return region_code_index
+
+def get_country_code_by_region(region_name, region_code_index):
     """
     지역명을 기반으로 008 발행국 부호를 찾음.
-    region_data: DataFrame, columns=["발행국", "발행국 부호"]
+    region_code_index: build_region_code_index()로 만든 딕셔너리
     """
     try:
-        def normalize_region_for_code(region):
-            region = (region or "").strip()
-            if region.startswith(("전라", "충청", "경상")):
-                return region[0] + (region[2] if len(region) > 2 else "")
-            return region[:2]
-        normalized_input = normalize_region_for_code(region_name)
-        for idx, row in region_data.iterrows():
-            sheet_region, country_code = row["발행국"], row["발행국 부호"]
-            if normalize_region_for_code(sheet_region) == normalized_input:
-                return country_code.strip() or "xxu"
-
-        return "xxu"
+        return region_code_index.get(normalize_region_for_code(region_name), "xxu")
     except Exception as e:
         st.write(f"⚠️ get_country_code_by_region 예외: {e}")
         return "xxu"
@@ -342,25 +537,35 @@ def get_country_code_by_region(region_name, region_data):
 # =========================
 # --- 문체부 검색 ---
 # =========================
-def get_mcst_address(publisher_name):
+_MCST_ROWS_XPATH = (
+    "//table[contains(concat(' ', normalize-space(@class), ' '), ' board ')]"
+    "/tbody/tr[count(td) >= 4][normalize-space(td[4]) = '영업']"
+)
+
+# 같은 출판사가 배치 안에서 반복되는 경우가 많으므로 출판사명 단위로 결과(영업 행)를 캐시
+@async_lru_cache(maxsize=4096)
+async def _get_mcst_rows(publisher_name, session):
     url = "https://book.mcst.go.kr/html/searchList.php"
     params = {"search_area": "전체", "search_state": "1", "search_kind": "1", 
               "search_type": "1", "search_word": publisher_name}
+    async with session.get(url, params=params) as res:
+        res.raise_for_status()
+        html = await res.text()
+    tree = await asyncio.to_thread(lxml.html.fromstring, html)
+    results = []
+    # 4칸 이상이면서 영업구분이 '영업'인 행만 XPath 단계에서 골라냄
+    for row in tree.xpath(_MCST_ROWS_XPATH):
+        reg_type, name, address, status = (
+            "".join(t.strip() for t in td.itertext()) for td in row.findall("td")[:4]
+        )
+        results.append((reg_type, name, address, status))
+    return tuple(results)
+
+
+async def get_mcst_address(publisher_name, session):
     debug_msgs = []
     try:
-        res = requests.get(url, params=params, timeout=15)
-        res.raise_for_status()
-        soup = BeautifulSoup(res.text, "html.parser")
-        results = []
-        for row in soup.select("table.board tbody tr"):
-            cols = row.find_all("td")
-            if len(cols) >= 4:
-                reg_type = cols[0].get_text(strip=True)
-                name = cols[1].get_text(strip=True)
-                address = cols[2].get_text(strip=True)
-                status = cols[3].get_text(strip=True)
-                if status == "영업":
-                    results.append((reg_type, name, address, status))
+        results = list(await _get_mcst_rows(publisher_name, session))
         if results:
             debug_msgs.append(f"[문체부] 검색 성공: {len(results)}건")
             return results[0][2], results, debug_msgs
@@ -373,37 +578,31 @@ def get_mcst_address(publisher_name):
 
         
 # =========================
-# --- Streamlit UI ---
+# --- 최종 MARC 출력 형식 (008/245/260/300 줄 구성은 여기서만 정의) ---
 # =========================
-st.title("📚 ISBN → KORMARC 변환기")
+MARC_260_TEMPLATE = "=260  \\$a{loc} :$b{pub},$c{year}"
+MARC_TEXT_TEMPLATE = "=008  \\$a{code}\n{f245}\n{f260}\n{f300}"
 
-if st.button("🔄 구글시트 새로고침"):
-    st.cache_data.clear()
-    st.success("캐시 초기화 완료! 다음 호출 시 최신 데이터 반영됩니다.")
-
-isbn_input = st.text_area("ISBN을 '/'로 구분하여 입력:")
-
-records = []
-all_mcst_results = []
-
-if isbn_input:
-    isbn_list = [re.sub(r"[^\d]", "", s) for s in isbn_input.split("/") if s.strip()]
-    publisher_data, region_data, imprint_data = load_publisher_db()
-
-    for idx, isbn in enumerate(isbn_list, start=1):
-        st.markdown(f"---\n### 📘 {idx}. ISBN: `{isbn}`")
+# =========================
+# --- ISBN 1건 처리 (UI 호출 없이 결과만 반환) ---
+# =========================
+async def process_isbn(isbn, session, aladin_session, sem, publisher_data, publisher_buckets, imprint_data, region_code_index):
+    async with sem:
         debug_messages = []
 
         # 1) Aladin API (기본 정보 + 상세 페이지 링크)
-        result, link, error = search_aladin_by_isbn(isbn)
+        result, link, error = await search_aladin_by_isbn(isbn, aladin_session)
         if error:
-            st.warning(f"[Aladin API] {error}")
-            continue
+            return {"isbn": isbn, "error": error}
         publisher_api = result["publisher"]
         pubyear = result["pubyear"]
-        
-        # 1-1) Aladin 상세 페이지 크롤링 (300 필드)
-        physical_data, detail_error = search_aladin_detail_page(link)
+
+        # 1-1) 서로 독립적인 상세 페이지 / KPIPA 조회를 동시에 실행
+        #      (문체부는 2)~5)에서 출판지를 못 찾은 경우에만 6)에서 조회)
+        (physical_data, detail_error), kpipa_tuple = await asyncio.gather(
+            search_aladin_detail_page(link, session),
+            get_publisher_name_from_isbn_kpipa(isbn, session),
+        )
         field_300 = physical_data.get("300", "=300  \\$a1책. [파싱 실패]") 
        
         if detail_error:
@@ -418,7 +617,7 @@ if isbn_input:
             )
 
         # 2) KPIPA 페이지 검색
-        publisher_full, publisher_norm, kpipa_error = get_publisher_name_from_isbn_kpipa(isbn)
+        publisher_full, publisher_norm, kpipa_error = kpipa_tuple
         location_raw = "출판지 미상"
         if publisher_norm:
             debug_messages.append(f"✅ KPIPA 페이지 검색 성공: {publisher_full}")
@@ -427,14 +626,14 @@ if isbn_input:
         else:
             debug_messages.append(f"[KPIPA 페이지] {kpipa_error}")
             publisher_norm = publisher_api
+        norm = normalize_publisher_for_lookup(publisher_norm)
 
         # 3) 1차 정규화 후 KPIPA DB
         if location_raw == "출판지 미상":
-            rep_name, aliases = split_publisher_aliases(publisher_norm)
-            location_raw, debug_stage1 = search_publisher_location_with_alias(rep_name, publisher_data)
+            location_raw, debug_stage1 = search_publisher_location_with_alias(norm.rep, publisher_data)
             debug_messages.extend([f"[1차 정규화 KPIPA DB] {msg}" for msg in debug_stage1])
             if location_raw == "출판지 미상":
-                for alias in aliases:
+                for alias in norm.aliases:
                     location_raw, debug_alias = search_publisher_location_with_alias(alias, publisher_data)
                     if location_raw != "출판지 미상":
                         debug_messages.append(f"✅ 별칭 '{alias}' 매칭 성공! ({location_raw})")
@@ -442,29 +641,35 @@ if isbn_input:
 
         # 4) IM 검색
         if location_raw == "출판지 미상":
-            main_pub, debug_im = find_main_publisher_from_imprints(rep_name, imprint_data, publisher_data)
+            main_pub, debug_im = find_main_publisher_from_imprints(norm.rep, imprint_data, publisher_data)
             if main_pub:
                 location_raw = main_pub
             debug_messages.extend([f"[IM DB] {msg}" for msg in debug_im])
 
         # 5) 2차 정규화 KPIPA DB
         if location_raw == "출판지 미상":
-            stage2_name = normalize_stage2(publisher_norm)
-            location_raw, debug_stage2 = search_publisher_location_with_alias(stage2_name, publisher_data)
+            location_raw, debug_stage2 = search_publisher_location_with_alias(norm.stage2, publisher_data)
             debug_messages.extend([f"[2차 정규화 KPIPA DB] {msg}" for msg in debug_stage2])
 
             # ✅ 2차 정규화 후 IM DB 검색
             if location_raw == "출판지 미상":
-                main_pub_stage2, debug_im_stage2 = find_main_publisher_from_imprints(stage2_name, imprint_data, publisher_data)
+                main_pub_stage2, debug_im_stage2 = find_main_publisher_from_imprints(norm.stage2, imprint_data, publisher_data)
                 if main_pub_stage2:
                     location_raw = main_pub_stage2
                 debug_messages.extend([f"[IM DB 2차 정규화 후] {msg}" for msg in debug_im_stage2])
 
+        # 5-1) 정확 매칭이 모두 실패한 경우에만 유사(fuzzy) 매칭 (문체부 조회 전 마지막 수단)
+        if location_raw == "출판지 미상":
+            location_raw, debug_fuzzy = search_publisher_location_fuzzy(
+                (publisher_norm, norm.rep, norm.stage2), publisher_data, publisher_buckets
+            )
+            debug_messages.extend([f"[유사 매칭 KPIPA DB] {msg}" for msg in debug_fuzzy])
 
-        # 6) 문체부 검색
-        mcst_address, mcst_results, debug_mcst = get_mcst_address(publisher_norm)
-        debug_messages.extend(debug_mcst)
+        # 6) 문체부 검색 (앞 단계에서 출판지를 이미 찾았으면 생략)
+        mcst_results = []
         if location_raw == "출판지 미상":
+            mcst_address, mcst_results, debug_mcst = await get_mcst_address(publisher_norm, session)
+            debug_messages.extend(debug_mcst)
             if mcst_results:
                 location_raw = mcst_results[0][2]
                 debug_messages.append(f"[문체부] 매칭 성공: {mcst_results}")
@@ -476,25 +681,11 @@ if isbn_input:
         location_display = normalize_publisher_location_for_display(location_raw)
 
         # 8) MARC 008 발행국 발행국 부호
-        code = get_country_code_by_region(location_raw, region_data)
-
-        # 9) 최종 출력
-        with st.container():
-            marc_text = (
-                f"=008  \\$a{code}\n"
-                f"{result['245']}\n"
-                f"=260  \\$a{location_display} :$b{publisher_api},$c{pubyear}\n"
-                f"{field_300}"
-            )
-            st.code(marc_text, language="text")
-        with st.expander("🔹 Debug / 후보 메시지"):
-            for msg in debug_messages:
-                st.write(msg)
-        with st.expander("🔹 문체부 등록 출판사 결과 확인"):
-            if mcst_results:
-                st.table(pd.DataFrame(mcst_results, columns=["등록구분", "출판사명", "주소", "상태"]))
-            else:
-                st.write("❌ 문체부 결과 없음")
+        code = get_country_code_by_region(location_raw, region_code_index)
+
+        # 9) 최종 출력용 MARC 텍스트
+        marc_260 = MARC_260_TEMPLATE.format_map({"loc": location_display, "pub": publisher_api, "year": pubyear})
+        marc_text = MARC_TEXT_TEMPLATE.format_map({"code": code, "f245": result['245'], "f260": marc_260, "f300": field_300})
         # 결과를 딕셔너리로 저장
         record = {
             "ISBN": isbn,
@@ -505,17 +696,106 @@ if isbn_input:
             "출판지": location_raw,
             "발행국 부호": code,
             "MARC 245": result['245'],
-            "MARC 260": f"=260  \\$a{location_display} :$b{publisher_api},$c{pubyear}",
+            "MARC 260": marc_260,
             "MARC 300": field_300
         }
-        records.append(record)
+        return {
+            "isbn": isbn,
+            "error": None,
+            "marc_text": marc_text,
+            "debug_messages": debug_messages,
+            "mcst_results": mcst_results,
+            "record": record,
+        }
+
+
+async def process_isbn_batch(isbn_list, publisher_data, publisher_buckets, imprint_data, region_code_index):
+    """
+    ISBN 전체를 커넥터 하나를 공유하는 aiohttp 세션(알라딘 API 외 응답은 SQLite 디스크 캐시)으로 동시에 처리 (Semaphore로 동시 처리 수 제한).
+    결과는 입력 순서대로 반환.
+    """
+    sem = asyncio.Semaphore(MAX_CONCURRENT_ISBNS)
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
+    cache = SQLiteBackend(HTTP_CACHE_NAME, expire_after=HTTP_CACHE_EXPIRE)
+    # 알라딘 API(ItemLookUp)는 오류·검색 결과 없음도 HTTP 200으로 오고 URL에 ttbkey가 들어가므로
+    # 디스크 캐시를 거치지 않는 일반 세션으로 보냄 (커넥터는 공유, 닫기는 CachedSession이 담당)
+    async with CachedSession(cache=cache, connector=connector, headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT) as session, \
+            aiohttp.ClientSession(connector=connector, connector_owner=False,
+                                  headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT) as aladin_session:
+        return await asyncio.gather(*(
+            process_isbn(isbn, session, aladin_session, sem, publisher_data, publisher_buckets, imprint_data, region_code_index)
+            for isbn in isbn_list
+        ))
+
+        
+# =========================
+# --- Streamlit UI ---
+# =========================
+st.title("📚 ISBN → KORMARC 변환기")
+
+if st.button("🔄 구글시트 새로고침"):
+    st.cache_data.clear()
+    # 이전 배치 결과도 버려서 다음 실행 때 최신 DB로 다시 조회
+    st.session_state.pop("batch_key", None)
+    st.session_state.pop("batch_results", None)
+    st.success("캐시 초기화 완료! 다음 호출 시 최신 데이터 반영됩니다.")
+
+isbn_input = st.text_area("ISBN을 '/'로 구분하여 입력:")
+
+_NON_DIGIT_RE = re.compile(r"\D")   # ISBN 입력에서 숫자 외 문자 제거용
+
+all_mcst_results = []
+
+if isbn_input:
+    import pandas as pd   # 결과 표 출력에만 필요
+    import xlsxwriter
+    isbn_list = [_NON_DIGIT_RE.sub("", s) for s in isbn_input.split("/") if s.strip()]
+
+    # 같은 ISBN 목록이면 (다른 위젯 조작으로 인한 재실행) DB 로드/조회 없이 이전 결과를 그대로 사용
+    batch_key = hashlib.sha1("/".join(isbn_list).encode()).hexdigest()
+    if st.session_state.get("batch_key") == batch_key:
+        results = st.session_state["batch_results"]
+    else:
+        with st.spinner("📄 출판사 DB 불러오는 중..."):
+            publisher_data, publisher_buckets, imprint_data, region_code_index = load_publisher_db()
+        # 네트워크 조회는 비동기로 한꺼번에 처리하고, Streamlit 출력은 끝난 뒤 입력 순서대로
+        with st.spinner("🔍 ISBN 조회 중..."):
+            results = asyncio.run(process_isbn_batch(isbn_list, publisher_data, publisher_buckets, imprint_data, region_code_index))
+        st.session_state["batch_key"] = batch_key
+        st.session_state["batch_results"] = results
+
+    # 결과 엑셀은 DataFrame으로 모으지 않고 ISBN마다 행 단위로 바로 기록
+    output = io.BytesIO()
+    # constant_memory: 행을 순서대로 쓰는 즉시 내보내므로 시트 전체를 메모리에 들고 있지 않음
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    worksheet = workbook.add_worksheet('MARC_Results')
+    excel_row = 0
+
+    for idx, res in enumerate(results, start=1):
+        st.markdown(f"---\n### 📘 {idx}. ISBN: `{res['isbn']}`")
+        if res["error"]:
+            st.warning(f"[Aladin API] {res['error']}")
+            continue
+
+        # 최종 출력
+        st.code(res["marc_text"], language="text")
+        with st.expander("🔹 Debug / 후보 메시지"):
+            for msg in res["debug_messages"]:
+                st.write(msg)
+        with st.expander("🔹 문체부 등록 출판사 결과 확인"):
+            if res["mcst_results"]:
+                st.table(pd.DataFrame(res["mcst_results"], columns=["등록구분", "출판사명", "주소", "상태"]))
+            else:
+                st.write("❌ 문체부 결과 없음")
+        record = res["record"]
+        if excel_row == 0:
+            worksheet.write_row(0, 0, list(record))   # 헤더 (첫 레코드의 키)
+        excel_row += 1
+        worksheet.write_row(excel_row, 0, list(record.values()))
+    workbook.close()
 
     # 모든 ISBN 처리 후 엑셀 다운로드 버튼 표시
-    if records:
-        df = pd.DataFrame(records)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='MARC_Results')
+    if excel_row:
         output.seek(0)
         
         st.markdown("---")
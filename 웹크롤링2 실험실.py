@@ -5,8 +5,10 @@ from bs4 import BeautifulSoup
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
+import xlsxwriter
 import io
-from pymarc import Record, Field, MARCWriter, Subfield   # ✅ Subfield 추가
+from concurrent.futures import ThreadPoolExecutor
+from pymarc import Record, Field, Subfield   # ✅ Subfield 추가
 
 
 # =========================
@@ -321,7 +323,7 @@ def get_publisher_name_from_isbn_kpipa(isbn):
 # ----발행국 부호 찾기-----
 # =========================
 
-def get_country_code_by_region(region_name, region_data):
+def get_country_code_by_region(region_name, region_data, debug_messages=None):
     """
     지역명을 기반으로 008 발행국 부호를 찾음.
     region_data: DataFrame, columns=["발행국", "발행국 부호"]
@@ -340,7 +342,9 @@ def get_country_code_by_region(region_name, region_data):
 
         return "xxu"
     except Exception as e:
-        st.write(f"⚠️ get_country_code_by_region 예외: {e}")
+        # 스레드에서 호출되므로 st.write 대신 디버그 메시지로 남김
+        if debug_messages is not None:
+            debug_messages.append(f"⚠️ get_country_code_by_region 예외: {e}")
         return "xxu"
 
 # =========================
@@ -378,34 +382,144 @@ def get_mcst_address(publisher_name):
 # =========================
 # --- MRC 변환 함수 추가 ---
 # =========================
-def export_to_mrc(records):
-    output = io.BytesIO()
-    writer = MARCWriter(output)
-    for rec in records:
-        record = Record(force_utf8=True)
-        # 008 (발행국 부호만 예시로 기록)
-        record.add_field(Field(tag="008", data=rec["발행국 부호"]))
-        # 245
-        record.add_field(Field(
-            tag="245", indicators=["1", "0"],
-            subfields=[Subfield("a", rec["제목"]), Subfield("c", rec["저자"])]   
-        ))
-        # 260
-        record.add_field(Field(
-            tag="260", indicators=[" ", " "],
-            subfields=[Subfield("a", rec["출판지"]), Subfield("b", rec["출판사"]), Subfield("c", rec["발행년도"])]
-        ))
-        # 300
-        if rec.get("300_subfields"):
-            record.add_field(Field(tag="300", indicators=[" ", " "], subfields=rec["300_subfields"]))
+def build_mrc_record(rec):
+    record = Record(force_utf8=True)
+    # 008 (발행국 부호만 예시로 기록)
+    record.add_field(Field(tag="008", data=rec["발행국 부호"]))
+    # 245
+    record.add_field(Field(
+        tag="245", indicators=["1", "0"],
+        subfields=[Subfield("a", rec["제목"]), Subfield("c", rec["저자"])]   
+    ))
+    # 260
+    record.add_field(Field(
+        tag="260", indicators=[" ", " "],
+        subfields=[Subfield("a", rec["출판지"]), Subfield("b", rec["출판사"]), Subfield("c", rec["발행년도"])]
+    ))
+    # 300
+    if rec.get("300_subfields"):
+        record.add_field(Field(tag="300", indicators=[" ", " "], subfields=rec["300_subfields"]))
+    else:
+        # fallback: 전체 문자열을 그냥 $a에만 넣음
+        field_300_str = rec.get("MARC 300", "=300  \\$a1책.").replace("=300  ", "").strip()
+        record.add_field(Field(tag="300", indicators=[" ", " "], subfields=[Subfield("a", field_300_str)]))
+    return record
+
+# =========================
+# --- 최종 MARC 출력 형식 (008/245/260/300 줄 구성은 여기서만 정의) ---
+# =========================
+MARC_260_TEMPLATE = "=260  \\$a{loc} :$b{pub},$c{year}"
+MARC_TEXT_TEMPLATE = "=008  \\$a{code}\n{f245}\n{f260}\n{f300}"
+
+# =========================
+# --- ISBN 1건 처리 (스레드에서 실행되므로 Streamlit 호출 없이 결과만 반환) ---
+# =========================
+def process_isbn(isbn, publisher_data, region_data, imprint_data):
+    """반환: ((isbn, 오류, MARC 텍스트, 디버그 메시지, 문체부 결과), 레코드 또는 None)"""
+    debug_messages = []
+
+    # 1) Aladin API (기본 정보 + 상세 페이지 링크)
+    result, link, error = search_aladin_by_isbn(isbn)
+    if error:
+        return (isbn, error, None, None, None), None
+    publisher_api = result["publisher"]
+    pubyear = result["pubyear"]
+
+    # 1-1) Aladin 상세 페이지 크롤링 (300 필드)
+    physical_data, detail_error = search_aladin_detail_page(link)
+    field_300 = physical_data.get("300", "=300  \\$a1책. [파싱 실패]") 
+       
+    if detail_error:
+        debug_messages.append(f"[Aladin 상세] {detail_error}")
+    else:
+        page_val = physical_data.get('page_value', 'N/A')
+        size_val = physical_data.get('size_value', 'N/A')
+        illus_val = physical_data.get('illustration_possibility', '없음')
+        debug_messages.append(
+            f"✅ Aladin 상세 페이지 파싱 성공 "
+            f"(페이지: {page_val}, 크기: {size_val}, 삽화감지: {illus_val})"
+        )
+
+    # 2) KPIPA 페이지 검색
+    publisher_full, publisher_norm, kpipa_error = get_publisher_name_from_isbn_kpipa(isbn)
+    location_raw = "출판지 미상"
+    if publisher_norm:
+        debug_messages.append(f"✅ KPIPA 페이지 검색 성공: {publisher_full}")
+        location_raw, debug_kpipa_db = search_publisher_location_with_alias(publisher_norm, publisher_data)
+        debug_messages.extend([f"[KPIPA DB] {msg}" for msg in debug_kpipa_db])
+    else:
+        debug_messages.append(f"[KPIPA 페이지] {kpipa_error}")
+        publisher_norm = publisher_api
+
+    # 3) 1차 정규화 후 KPIPA DB
+    if location_raw == "출판지 미상":
+        rep_name, aliases = split_publisher_aliases(publisher_norm)
+        location_raw, debug_stage1 = search_publisher_location_with_alias(rep_name, publisher_data)
+        debug_messages.extend([f"[1차 정규화 KPIPA DB] {msg}" for msg in debug_stage1])
+        if location_raw == "출판지 미상":
+            for alias in aliases:
+                location_raw, debug_alias = search_publisher_location_with_alias(alias, publisher_data)
+                if location_raw != "출판지 미상":
+                    debug_messages.append(f"✅ 별칭 '{alias}' 매칭 성공! ({location_raw})")
+                    break          
+
+    # 4) IM 검색
+    if location_raw == "출판지 미상":
+        main_pub, debug_im = find_main_publisher_from_imprints(rep_name, imprint_data, publisher_data)
+        if main_pub:
+            location_raw = main_pub
+        debug_messages.extend([f"[IM DB] {msg}" for msg in debug_im])
+
+    # 5) 2차 정규화 KPIPA DB
+    if location_raw == "출판지 미상":
+        stage2_name = normalize_stage2(publisher_norm)
+        location_raw, debug_stage2 = search_publisher_location_with_alias(stage2_name, publisher_data)
+        debug_messages.extend([f"[2차 정규화 KPIPA DB] {msg}" for msg in debug_stage2])
+
+        # ✅ 2차 정규화 후 IM DB 검색
+        if location_raw == "출판지 미상":
+            main_pub_stage2, debug_im_stage2 = find_main_publisher_from_imprints(stage2_name, imprint_data, publisher_data)
+            if main_pub_stage2:
+                location_raw = main_pub_stage2
+            debug_messages.extend([f"[IM DB 2차 정규화 후] {msg}" for msg in debug_im_stage2])
+
+
+    # 6) 문체부 검색
+    mcst_address, mcst_results, debug_mcst = get_mcst_address(publisher_norm)
+    debug_messages.extend(debug_mcst)
+    if location_raw == "출판지 미상":
+        if mcst_results:
+            location_raw = mcst_results[0][2]
+            debug_messages.append(f"[문체부] 매칭 성공: {mcst_results}")
         else:
-            # fallback: 전체 문자열을 그냥 $a에만 넣음
-            field_300_str = rec.get("MARC 300", "=300  \\$a1책.").replace("=300  ", "").strip()
-            record.add_field(Field(tag="300", indicators=[" ", " "], subfields=[Subfield("a", field_300_str)]))       
-        writer.write(record)
+            location_raw = mcst_address
+            debug_messages.append(f"[문체부] 매칭 실패")
+
+    # 7) 발행국 표시용 정규화
+    location_display = normalize_publisher_location_for_display(location_raw)
+
+    # 8) MARC 008 발행국 발행국 부호
+    code = get_country_code_by_region(location_raw, region_data, debug_messages)
+
+    # 9) 최종 출력용 MARC 텍스트
+    marc_260 = MARC_260_TEMPLATE.format_map({"loc": location_display, "pub": publisher_api, "year": pubyear})
+    marc_text = MARC_TEXT_TEMPLATE.format_map({"code": code, "f245": result['245'], "f260": marc_260, "f300": field_300})
+    # 결과를 딕셔너리로 저장
+    record = {
+        "ISBN": isbn,
+        "제목": result['title'],
+        "저자": result['creator'],
+        "출판사": publisher_api,
+        "발행년도": pubyear,
+        "출판지": location_display,
+        "발행국 부호": code,
+        "MARC 245": result['245'],
+        "MARC 260": marc_260,
+        "MARC 300": field_300,
+        "300_subfields": physical_data.get("300_subfields", [])  # ✅ pymarc용 Subfield 리스트
+    }
+    return (isbn, None, marc_text, debug_messages, mcst_results), record
 
-    output.seek(0)
-    return output
         
 # =========================
 # --- Streamlit UI ---
@@ -418,110 +532,44 @@ if st.button("🔄 구글시트 새로고침"):
 
 isbn_input = st.text_area("ISBN을 '/'로 구분하여 입력:")
 
-records = []
 all_mcst_results = []
 
 if isbn_input:
     isbn_list = [re.sub(r"[^\d]", "", s) for s in isbn_input.split("/") if s.strip()]
     publisher_data, region_data, imprint_data = load_publisher_db()
 
-    for idx, isbn in enumerate(isbn_list, start=1):
+    # 결과 엑셀/MRC는 레코드를 모아두지 않고 ISBN마다 바로 기록
+    output = io.BytesIO()
+    # constant_memory: 행을 순서대로 쓰는 즉시 내보내므로 시트 전체를 메모리에 들고 있지 않음
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    worksheet = workbook.add_worksheet('MARC_Results')
+    mrc_output = io.BytesIO()
+    excel_row = 0
+    # 네트워크 대기가 대부분이므로 ISBN들을 스레드 풀에서 동시에 처리 (결과는 입력 순서 유지)
+    # Streamlit 출력/엑셀/MRC 기록은 풀이 끝난 뒤 메인 스레드에서
+    with st.spinner("🔍 ISBN 조회 중..."):
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = list(executor.map(
+                lambda isbn: process_isbn(isbn, publisher_data, region_data, imprint_data), isbn_list
+            ))
+
+    for _, record in results:
+        if record is None:
+            continue
+        if excel_row == 0:
+            worksheet.write_row(0, 0, list(record))   # 헤더 (첫 레코드의 키)
+        excel_row += 1
+        # 300_subfields(Subfield 리스트)는 엑셀에 문자열로 기록
+        worksheet.write_row(excel_row, 0, [str(v) if isinstance(v, list) else v for v in record.values()])
+        mrc_output.write(build_mrc_record(record).as_marc())
+    workbook.close()
+
+    for idx, ((isbn, error, marc_text, debug_messages, mcst_results), _) in enumerate(results, start=1):
         st.markdown(f"---\n### 📘 {idx}. ISBN: `{isbn}`")
-        debug_messages = []
-
-        # 1) Aladin API (기본 정보 + 상세 페이지 링크)
-        result, link, error = search_aladin_by_isbn(isbn)
         if error:
             st.warning(f"[Aladin API] {error}")
             continue
-        publisher_api = result["publisher"]
-        pubyear = result["pubyear"]
-        
-        # 1-1) Aladin 상세 페이지 크롤링 (300 필드)
-        physical_data, detail_error = search_aladin_detail_page(link)
-        field_300 = physical_data.get("300", "=300  \\$a1책. [파싱 실패]") 
-       
-        if detail_error:
-            debug_messages.append(f"[Aladin 상세] {detail_error}")
-        else:
-            page_val = physical_data.get('page_value', 'N/A')
-            size_val = physical_data.get('size_value', 'N/A')
-            illus_val = physical_data.get('illustration_possibility', '없음')
-            debug_messages.append(
-                f"✅ Aladin 상세 페이지 파싱 성공 "
-                f"(페이지: {page_val}, 크기: {size_val}, 삽화감지: {illus_val})"
-            )
-
-        # 2) KPIPA 페이지 검색
-        publisher_full, publisher_norm, kpipa_error = get_publisher_name_from_isbn_kpipa(isbn)
-        location_raw = "출판지 미상"
-        if publisher_norm:
-            debug_messages.append(f"✅ KPIPA 페이지 검색 성공: {publisher_full}")
-            location_raw, debug_kpipa_db = search_publisher_location_with_alias(publisher_norm, publisher_data)
-            debug_messages.extend([f"[KPIPA DB] {msg}" for msg in debug_kpipa_db])
-        else:
-            debug_messages.append(f"[KPIPA 페이지] {kpipa_error}")
-            publisher_norm = publisher_api
-
-        # 3) 1차 정규화 후 KPIPA DB
-        if location_raw == "출판지 미상":
-            rep_name, aliases = split_publisher_aliases(publisher_norm)
-            location_raw, debug_stage1 = search_publisher_location_with_alias(rep_name, publisher_data)
-            debug_messages.extend([f"[1차 정규화 KPIPA DB] {msg}" for msg in debug_stage1])
-            if location_raw == "출판지 미상":
-                for alias in aliases:
-                    location_raw, debug_alias = search_publisher_location_with_alias(alias, publisher_data)
-                    if location_raw != "출판지 미상":
-                        debug_messages.append(f"✅ 별칭 '{alias}' 매칭 성공! ({location_raw})")
-                        break          
-
-        # 4) IM 검색
-        if location_raw == "출판지 미상":
-            main_pub, debug_im = find_main_publisher_from_imprints(rep_name, imprint_data, publisher_data)
-            if main_pub:
-                location_raw = main_pub
-            debug_messages.extend([f"[IM DB] {msg}" for msg in debug_im])
-
-        # 5) 2차 정규화 KPIPA DB
-        if location_raw == "출판지 미상":
-            stage2_name = normalize_stage2(publisher_norm)
-            location_raw, debug_stage2 = search_publisher_location_with_alias(stage2_name, publisher_data)
-            debug_messages.extend([f"[2차 정규화 KPIPA DB] {msg}" for msg in debug_stage2])
-
-            # ✅ 2차 정규화 후 IM DB 검색
-            if location_raw == "출판지 미상":
-                main_pub_stage2, debug_im_stage2 = find_main_publisher_from_imprints(stage2_name, imprint_data, publisher_data)
-                if main_pub_stage2:
-                    location_raw = main_pub_stage2
-                debug_messages.extend([f"[IM DB 2차 정규화 후] {msg}" for msg in debug_im_stage2])
-
-
-        # 6) 문체부 검색
-        mcst_address, mcst_results, debug_mcst = get_mcst_address(publisher_norm)
-        debug_messages.extend(debug_mcst)
-        if location_raw == "출판지 미상":
-            if mcst_results:
-                location_raw = mcst_results[0][2]
-                debug_messages.append(f"[문체부] 매칭 성공: {mcst_results}")
-            else:
-                location_raw = mcst_address
-                debug_messages.append(f"[문체부] 매칭 실패")
-
-        # 7) 발행국 표시용 정규화
-        location_display = normalize_publisher_location_for_display(location_raw)
-
-        # 8) MARC 008 발행국 발행국 부호
-        code = get_country_code_by_region(location_raw, region_data)
-
-        # 9) 최종 출력
-        with st.container():
-            marc_text = (
-                f"=008  \\$a{code}\n"
-                f"{result['245']}\n"
-                f"=260  \\$a{location_display} :$b{publisher_api},$c{pubyear}\n"
-                f"{field_300}"
-            )
-            st.code(marc_text, language="text")
+        st.code(marc_text, language="text")
         with st.expander("🔹 Debug / 후보 메시지"):
             for msg in debug_messages:
                 st.write(msg)
@@ -530,28 +578,9 @@ if isbn_input:
                 st.table(pd.DataFrame(mcst_results, columns=["등록구분", "출판사명", "주소", "상태"]))
             else:
                 st.write("❌ 문체부 결과 없음")
-        # 결과를 딕셔너리로 저장
-        record = {
-            "ISBN": isbn,
-            "제목": result['title'],
-            "저자": result['creator'],
-            "출판사": publisher_api,
-            "발행년도": pubyear,
-            "출판지": location_display,
-            "발행국 부호": code,
-            "MARC 245": result['245'],
-            "MARC 260": f"=260  \\$a{location_display} :$b{publisher_api},$c{pubyear}",
-            "MARC 300": field_300,
-            "300_subfields": physical_data.get("300_subfields", [])  # ✅ pymarc용 Subfield 리스트
-        }
-        records.append(record)
 
     # 모든 ISBN 처리 후 엑셀 다운로드 버튼 표시
-    if records:
-        df = pd.DataFrame(records)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='MARC_Results')
+    if excel_row:
         output.seek(0)
         
         st.markdown("---")
@@ -565,10 +594,10 @@ if isbn_input:
         )
         
         # ✅ MRC 다운로드
-        mrc_data = export_to_mrc(records)
+        mrc_output.seek(0)
         st.download_button(
             label="📥 결과 MRC 파일 다운로드",
-            data=mrc_data,
+            data=mrc_output,
             file_name="kormarc_results.mrc",
             mime="application/marc"
         )
@@ -1,7 +1,38 @@
 import streamlit as st
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.html
+
+# =========================
+# --- HTTP 세션 (검색어 여러 개를 같은 keep-alive 커넥션으로 조회) ---
+# =========================
+# Streamlit은 입력마다 스크립트를 다시 실행하므로 cache_resource로 세션 하나를 rerun 간 유지
+@st.cache_resource
+def _get_session() -> requests.Session:
+    s = requests.Session()
+    s.headers.update({
+        "User-Agent": "Mozilla/5.0",
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+    retries = Retry(
+        total=3, backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"], raise_on_status=False
+    )
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=20, pool_maxsize=20)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+SESSION = _get_session()
+
+# 결과 표(table.board)에서 칸이 4개 이상인 행만 XPath 한 번으로 선택
+_MCST_ROWS_XPATH = (
+    "//table[contains(concat(' ', normalize-space(@class), ' '), ' board ')]"
+    "/tbody/tr[count(td) >= 4]"
+)
 
 st.title("문화체육관광부 도서정보 검색")
 
@@ -9,6 +40,7 @@ st.title("문화체육관광부 도서정보 검색")
 query_text = st.text_area("검색어를 입력하세요 (여러 개는 줄바꿈으로 구분):", "그린애플\n시공주니어")
 
 if st.button("검색하기"):
+    import pandas as pd   # 결과 표 출력에만 필요하므로 검색할 때만 불러옴
     queries = [q.strip() for q in query_text.split("\n") if q.strip()]
     all_results = []
 
@@ -25,21 +57,16 @@ if st.button("검색하기"):
         }
 
         try:
-            response = requests.get(url, params=params)
+            response = SESSION.get(url, params=params, timeout=(5, 15))
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # 결과 추출
-            results = []
-            for row in soup.select("table.board tbody tr"):
-                cols = row.find_all("td")
-                if len(cols) >= 4:
-                    reg_type = cols[0].get_text(strip=True)   # 등록구분
-                    name = cols[1].get_text(strip=True)       # 상호
-                    address = cols[2].get_text(strip=True)    # 주소
-                    status = cols[3].get_text(strip=True)     # 영업구분
-                    results.append((reg_type, name, address, status))
-                    all_results.append((query, reg_type, name, address, status))
+            tree = lxml.html.fromstring(response.text)
+
+            # 결과 추출 (행마다 앞 4칸: 등록구분 / 상호 / 주소 / 영업구분)
+            results = [
+                tuple("".join(t.strip() for t in td.itertext()) for td in row.findall("td")[:4])
+                for row in tree.xpath(_MCST_ROWS_XPATH)
+            ]
+            all_results.extend((query, *row) for row in results)
 
             # 출력
             if results:
@@ -1,17 +1,22 @@
 import streamlit as st
+import os
 import requests
 import pandas as pd
 import openai
 import xml.etree.ElementTree as ET
 import re
 import io
+import json
+import orjson
 import xml.etree.ElementTree as ET
 import re, datetime
-from collections import Counter
-from bs4 import BeautifulSoup
+from functools import lru_cache
 from openai import OpenAI
 from requests.adapters import HTTPAdapter, Retry
 from concurrent.futures import ThreadPoolExecutor
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from diskcache import Cache
 
 # ── 한 번만 생성: 국중API용 세션 & 재시도 설정
 _nlk_session = requests.Session()
@@ -26,12 +31,65 @@ _nlk_session.mount(
     )
 )
 
+# ── 한 번만 생성: 알라딘용 세션 (ISBN마다 TCP/TLS 연결을 새로 맺지 않도록 커넥션 풀 재사용)
+#    Streamlit rerun마다 다시 만들지 않도록 cache_resource로 보관
+@st.cache_resource
+def _get_aladin_session():
+    s = requests.Session()
+    s.mount("https://", HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=2,
+            backoff_factor=0.3,
+            status_forcelist=[429,500,502,503,504]
+        )
+    ))
+    return s
+
+_aladin_session = _get_aladin_session()
+
+# ── 알라딘/국중/GPT 응답 디스크 캐시 (앱 재시작·재배포 후에도 같은 ISBN은 다시 요청하지 않음)
+#    KOMARC_NO_CACHE=1 이면 사용 안 함 / 오류(예외)는 저장되지 않음
+_disk_cache = Cache(".komarc_cache")
+DISK_CACHE_EXPIRE = 30 * 86400
+_NO_DISK_CACHE = os.getenv("KOMARC_NO_CACHE") == "1"
+
+def disk_cached(ignore=()):
+    def decorator(func):
+        if _NO_DISK_CACHE:
+            return func
+        return _disk_cache.memoize(expire=DISK_CACHE_EXPIRE, ignore=ignore)(func)
+    return decorator
+
+# ── ISBN별 작업(알라딘 조회, MARC 조립: 국중 + GPT)을 동시에 돌릴 공용 스레드 풀
+_executor = ThreadPoolExecutor(max_workers=8)
+
+def _submit_with_ctx(fn, *args):
+    # 작업 스레드에도 현재 Streamlit 스크립트 컨텍스트를 연결 → st.warning / st.cache_data가 그대로 동작
+    ctx = get_script_run_ctx()
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+    return _executor.submit(run)
+
 # ✅ API 키 (secrets.toml에서 불러오기)
 openai_key = st.secrets["api_keys"]["openai_key"]
 aladin_key = st.secrets["api_keys"]["aladin_key"]
 nlk_key = st.secrets["api_keys"]["nlk_key"]
 
-gpt_client = OpenAI(api_key=openai_key)
+# OpenAI 클라이언트(내부 httpx 커넥션 풀 포함)도 rerun마다 새로 만들지 않고 하나를 재사용
+@st.cache_resource
+def _get_gpt_client():
+    return OpenAI(api_key=openai_key)
+
+gpt_client = _get_gpt_client()
+GPT_MODEL = "gpt-4o-mini"  # KDC/653처럼 짧은 분류·추출 응답용 (gpt-4 대비 빠르고 저렴)
+
+# 008 버퍼의 [lo, hi) 위치에 값 기록 (길이 초과분은 자르고, 모자라면 기존 공백 유지)
+def _put_008(buf, lo, hi, s):
+    b = ("" if s is None else str(s)).encode("ascii", "replace")[:hi - lo]
+    buf[lo:lo + len(b)] = b
 
 # 008 본문(40자) 조립기: 단행본 기준, type_of_date 기본 's'
 def build_008_kormarc_bk(
@@ -48,72 +106,81 @@ def build_008_kormarc_bk(
     modified_record=" ",   # 28 기본 공백
     cataloging_src=" ",    # 32 기본 공백
 ):
-    def pad(s, n, fill=" "):
-        s = "" if s is None else str(s)
-        return (s[:n] + fill * n)[:n]
-
     if len(date_entered) != 6 or not date_entered.isdigit():
         raise ValueError("date_entered는 YYMMDD 6자리 숫자여야 합니다.")
     if len(date1) != 4:
         raise ValueError("date1은 4자리여야 합니다. 예: '2025', '19uu'")
 
-    body = "".join([
-        date_entered,               # 00-05
-        pad(type_of_date,1),        # 06
-        date1,                      # 07-10
-        pad(date2,4),               # 11-14
-        pad(country3,3),            # 15-17
-        pad(illus4,4),              # 18-21
-        " " * 4,                    # 22-25 (이용대상/자료형태/내용형식) 공백
-        " " * 2,                    # 26-27 공백
-        pad(modified_record,1),     # 28 공백
-        " ",                        # 29 회의간행물 공백
-        " ",                        # 30 기념논문집 공백
-        has_index if has_index in ("0","1") else "0", # 31 색인
-        pad(cataloging_src,1),      # 32 공백
-        pad(lit_form,1),            # 33 문학형식
-        pad(bio,1),                 # 34 전기
-        pad(lang3,3),               # 35-37 언어
-        " " * 2                     # 38-39 공백
-    ])
-    if len(body) != 40:
-        raise AssertionError(f"008 length != 40: {len(body)}")
-    return body
+    # 40자리 고정 길이 → 공백으로 채운 버퍼에 위치별로 덮어씀 (빈 자리는 공백 유지)
+    buf = bytearray(b" " * 40)
+    _put_008(buf, 0, 6, date_entered)        # 00-05
+    _put_008(buf, 6, 7, type_of_date)        # 06
+    _put_008(buf, 7, 11, date1)              # 07-10
+    _put_008(buf, 11, 15, date2)             # 11-14
+    _put_008(buf, 15, 18, country3)          # 15-17
+    _put_008(buf, 18, 22, illus4)            # 18-21
+                                             # 22-27 (이용대상/자료형태/내용형식) 공백
+    _put_008(buf, 28, 29, modified_record)   # 28 공백
+                                             # 29 회의간행물 / 30 기념논문집 공백
+    _put_008(buf, 31, 32, has_index if has_index in ("0","1") else "0")  # 31 색인
+    _put_008(buf, 32, 33, cataloging_src)    # 32 공백
+    _put_008(buf, 33, 34, lit_form)          # 33 문학형식
+    _put_008(buf, 34, 35, bio)               # 34 전기
+    _put_008(buf, 35, 38, lang3)             # 35-37 언어
+                                             # 38-39 공백
+    return buf.decode("ascii")
+
+# ── 감지용 정규식 (모듈 로드 시 한 번만 컴파일)
+_RE_YEAR    = re.compile(r"(?:19|20)\d{2}")
+_RE_ILLUS_A = re.compile(r"삽화|일러스트|일러스트레이션|그림|illustration", re.I)
+_RE_ILLUS_D = re.compile(r"도표|차트|그래프", re.I)
+_RE_ILLUS_O = re.compile(r"사진|포토|화보|photo", re.I)
+_RE_INDEX   = re.compile(r"색인|찾아보기|index", re.I)
+_RE_LIT_I   = re.compile(r"서간집|편지|서간문|letters?", re.I)
+_RE_LIT_M   = re.compile(r"기행|여행기|일기|수기|diary|travel", re.I)
+_RE_LIT_P   = re.compile(r"시집|poem|poetry", re.I)
+_RE_LIT_F   = re.compile(r"소설|novel|fiction", re.I)
+_RE_LIT_E   = re.compile(r"에세이|수필|essay", re.I)
+_RE_BIO_A   = re.compile(r"자서전|autobiograph", re.I)
+_RE_BIO_B   = re.compile(r"전기|평전|biograph", re.I)
+_RE_BIO_D   = re.compile(r"전기적|회고|회상")
+_RE_CLEAN   = re.compile(r'[\s\W_]+')
 
 # 알라딘 pubDate 문자열에서 연도만 추출
+@lru_cache(maxsize=4096)
 def extract_year_from_aladin_pubdate(pubdate_str: str) -> str:
-    m = re.search(r"(19|20)\d{2}", pubdate_str or "")
+    m = _RE_YEAR.search(pubdate_str or "")
     return m.group(0) if m else "19uu"
 
 # 삽화 감지: a(삽화/일러스트), d(도표/그래프), o(사진/화보)
 def detect_illus4(text: str) -> str:
     keys = []
-    if re.search(r"삽화|일러스트|일러스트레이션|그림|illustration", text, re.I): keys.append("a")
-    if re.search(r"도표|차트|그래프", text, re.I):                              keys.append("d")
-    if re.search(r"사진|포토|화보|photo", text, re.I):                           keys.append("o")
+    if _RE_ILLUS_A.search(text): keys.append("a")
+    if _RE_ILLUS_D.search(text): keys.append("d")
+    if _RE_ILLUS_O.search(text): keys.append("o")
     out=[]; [out.append(k) for k in keys if k not in out]
     return "".join(out)[:4]
 
 # 색인 감지: '색인', '찾아보기', 'index'
 def detect_index(text: str) -> str:
-    return "1" if re.search(r"색인|찾아보기|index", text, re.I) else "0"
+    return "1" if _RE_INDEX.search(text) else "0"
 
 # 문학형식 감지: p 시 / f 소설 / e 수필 / i 서간문학 / m 기행·일기·수기
 def detect_lit_form(title: str, category: str, kdc: str = None) -> str:
     blob = f"{title} {category}"
-    if re.search(r"서간집|편지|서간문|letters?", blob, re.I): return "i"
-    if re.search(r"기행|여행기|일기|수기|diary|travel", blob, re.I): return "m"
-    if re.search(r"시집|poem|poetry", blob, re.I): return "p"
-    if re.search(r"소설|novel|fiction", blob, re.I): return "f"
-    if re.search(r"에세이|수필|essay", blob, re.I): return "e"
+    if _RE_LIT_I.search(blob): return "i"
+    if _RE_LIT_M.search(blob): return "m"
+    if _RE_LIT_P.search(blob): return "p"
+    if _RE_LIT_F.search(blob): return "f"
+    if _RE_LIT_E.search(blob): return "e"
     return " "  # 비문학 또는 미분류
 
 # 전기 감지: a 자서전 / b 전기·평전(타인) / d 부분적 전기(회고/일기 등 암시)
 def detect_bio(text: str) -> str:
     t = text or ""
-    if re.search(r"자서전|autobiograph", t, re.I): return "a"
-    if re.search(r"전기|평전|biograph", t, re.I):  return "b"
-    if re.search(r"전기적|회고|회상", t):         return "d"
+    if _RE_BIO_A.search(t): return "a"
+    if _RE_BIO_B.search(t): return "b"
+    if _RE_BIO_D.search(t): return "d"
     return " "
 
 # ISBN 하나로 008 생성 (요청사항 반영: country/lang 임시 고정값)
@@ -153,76 +220,24 @@ def build_008_from_isbn(
     )
 # ========= 008 생성 블록: 붙여넣기 끝 =========
 
-# 🔍 키워드 추출 (konlpy 없이)
-def extract_keywords_from_text(text, top_n=7):
-    words = re.findall(r'\b[\w가-힣]{2,}\b', text)
-    filtered = [w for w in words if len(w) > 1]
-    freq = Counter(filtered)
-    return [kw for kw, _ in freq.most_common(top_n)]
-
-def clean_keywords(words):
-    stopwords = {"아주", "가지", "필요한", "등", "위해", "것", "수", "더", "이런", "있다", "된다", "한다"}
-    return [w for w in words if w not in stopwords and len(w) > 1]
-
-# 📚 카테고리 키워드 추출
-def extract_category_keywords(category_str):
-    keywords = set()
-    lines = category_str.strip().splitlines()
-    for line in lines:
-        parts = [x.strip() for x in line.split('>') if x.strip()]
-        if parts:
-            keywords.add(parts[-1])
-    return list(keywords)
-
-# 🔧 GPT 기반 KDC 추천
-# 🔧 GPT 기반 KDC 추천 (OpenAI 1.6.0+ 방식으로 리팩토링)
-def recommend_kdc(title, author, api_key):
-    try:
-        # 🔑 비밀의 열쇠로 클라이언트를 깨웁니다
-        client = OpenAI(api_key=api_key)
-
-        # 📜 주문문을 준비하고
-        prompt = (
-            f"도서 제목: {title}\n"
-            f"저자: {author}\n"
-            "이 책의 주제를 고려하여 한국십진분류(KDC) 번호 하나를 추천해 주세요.\n"
-            "정확한 숫자만 아래 형식으로 간단히 응답해 주세요:\n"
-            "KDC: 813.7"
-        )
-
-        # 🧠 GPT의 지혜를 소환
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
-
-        # ✂️ “KDC:” 뒤의 숫자만 꺼내서 돌려드립니다
-        for line in response.choices[0].message.content.splitlines():
-            if "KDC:" in line:
-                return line.split("KDC:")[1].strip()
-
-    except Exception as e:
-        st.warning(f"🧠 GPT 오류: {e}")
-
-    # 🛡️ 만약 실패하면 디폴트 “000”
-    return "000"
-
-
 # 📡 부가기호 추출 (국립중앙도서관)
-@st.cache_data(ttl=24*3600)
-def fetch_additional_code_from_nlk(isbn: str) -> str:
+@disk_cached()
+def _fetch_nlk_add_code(isbn: str) -> str:
     url = (
         f"https://www.nl.go.kr/seoji/SearchApi.do?"
         f"cert_key={nlk_key}&result_style=xml"
         f"&page_no=1&page_size=1&isbn={isbn}"
     )
+    res = _nlk_session.get(url, timeout=3)  # 3초만 기다리고
+    res.raise_for_status()
+    root = ET.fromstring(res.text)
+    doc  = root.find('.//docs/e')
+    return (doc.findtext('EA_ADD_CODE') or "").strip() if doc is not None else ""
+
+@st.cache_data(ttl=24*3600)
+def fetch_additional_code_from_nlk(isbn: str) -> str:
     try:
-        res = _nlk_session.get(url, timeout=3)  # 3초만 기다리고
-        res.raise_for_status()
-        root = ET.fromstring(res.text)
-        doc  = root.find('.//docs/e')
-        return (doc.findtext('EA_ADD_CODE') or "").strip() if doc is not None else ""
+        return _fetch_nlk_add_code(isbn)
     except Exception:
         st.warning("⚠️ 국중API 지연, 부가기호는 생략합니다.")
         return ""
@@ -236,7 +251,11 @@ ISDS_LANGUAGE_CODES = {
 }
 
 def detect_language(text):
-    text = re.sub(r'[\s\W_]+', '', text)
+    # 공백/기호 제거 후의 문자열 기준으로 캐시
+    return _detect_language_cleaned(_RE_CLEAN.sub('', text))
+
+@lru_cache(maxsize=4096)
+def _detect_language_cleaned(text):
     if not text:
         return 'und'
     first_char = text[0]
@@ -253,6 +272,7 @@ def detect_language(text):
     else:
         return 'und'
 
+@lru_cache(maxsize=4096)
 def generate_546_from_041_kormarc(marc_041: str) -> str:
     a_codes, h_code = [], None
     for part in marc_041.split():
@@ -272,128 +292,143 @@ def generate_546_from_041_kormarc(marc_041: str) -> str:
         return f"{'、'.join(langs)} 병기"
     return "언어 정보 없음"
 
-def crawl_aladin_original_and_price(isbn13):
-    url = f"https://www.aladin.co.kr/shop/wproduct.aspx?ISBN={isbn13}"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        res = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(res.text, "html.parser")
-        original = soup.select_one("div.info_original")
-        price = soup.select_one("span.price2")
-        return {
-            "original_title": original.text.strip() if original else "",
-            "price": price.text.strip().replace("정가 : ", "").replace("원", "").replace(",", "").strip() if price else ""
-        }
-    except:
-        return {}
-
-# 📄 653 필드 키워드 생성
-# ② 알라딘 메타데이터 호출 함수
-def fetch_aladin_metadata(isbn):
-    url = (
-        "http://www.aladin.co.kr/ttb/api/ItemLookUp.aspx"
-        f"?ttbkey={aladin_key}"
-        "&ItemIdType=ISBN"
-        f"&ItemId={isbn}"
-        "&output=js"
-        "&Version=20131101"
-        "&OptResult=Toc" 
+# GPT JSON 응답 원문 (같은 모델·프롬프트면 디스크 캐시에서 재사용)
+#    스트리밍으로 받다가 최상위 JSON 객체가 닫히는 즉시 중단
+#    (json_object 모드는 객체 뒤에 공백 토큰을 max_tokens까지 이어 붙이는 경우가 있음)
+#    객체가 끝나지 않은 채 잘리면 예외 → 깨진 응답은 캐시되지 않음
+@disk_cached()
+def _ask_gpt_json(model, system_content, user_content, max_tokens):
+    stream = gpt_client.chat.completions.create(
+        model=model,
+        messages=[{"role": "system", "content": system_content},
+                  {"role": "user", "content": user_content}],
+        temperature=0.2,
+        max_tokens=max_tokens,
+        response_format={"type": "json_object"},
+        stream=True,
     )
-    data = requests.get(url).json()
-    item = data["item"][0]
-    return {
-        "category": item.get("categoryName", ""),
-        "title": item.get("title", ""),
-        "description": item.get("description", ""),
-        "toc": item.get("toc", ""),
-    }
-
-
-# ③ GPT-4 기반 653 생성 함수
-def generate_653_with_gpt(category, title, description, toc, max_keywords=7):
+    buf, depth, in_str, escape = [], 0, False, False
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content or ""
+            for i, ch in enumerate(text):
+                if in_str:
+                    if escape:
+                        escape = False
+                    elif ch == "\\":
+                        escape = True
+                    elif ch == '"':
+                        in_str = False
+                elif ch == '"':
+                    in_str = True
+                elif ch == "{":
+                    depth += 1
+                elif ch == "}":
+                    depth -= 1
+                    if depth == 0:
+                        buf.append(text[:i + 1])
+                        return "".join(buf).strip()
+            buf.append(text)
+    finally:
+        stream.close()
+    raise ValueError(f"GPT JSON 응답이 중간에 끊김: {''.join(buf)[:80]!r}")
+
+# ④ KDC 추천 + 653 주제어를 GPT 한 번 호출로 생성 (MARC 조립에서 사용)
+def recommend_kdc_and_653(title, author, category, description, toc, max_keywords=7):
+    """반환: (KDC 번호 또는 "000", "$a키워드1$a키워드2…" 또는 None)"""
     parts = [p.strip() for p in category.split(">") if p.strip()]
     cat_kw = parts[-1] if parts else ""
     system_msg = {
         "role": "system",
         "content": (
             "당신은 도서관 메타데이터 전문가입니다. "
-            "책의 분류, 제목, 설명, 목차 정보를 바탕으로 "
-            "MARC 653 필드용 주제어를 추출하세요."
+            "책의 분류, 제목, 저자, 설명, 목차 정보를 바탕으로 "
+            "한국십진분류(KDC) 번호와 MARC 653 필드용 주제어를 추출하세요."
         )
     }
     user_msg = {
         "role": "user",
         "content": (
-            f"다음 입력으로 최대 {max_keywords}개의 MARC 653 주제어를 한 줄로 출력해 주세요:\n\n"
             f"- 분류: \"{cat_kw}\"\n"
             f"- 제목: \"{title}\"\n"
+            f"- 저자: \"{author}\"\n"
             f"- 설명: \"{description}\"\n"
             f"- 목차: \"{toc}\"\n\n"
-             "※ “제목”에 사용된 단어는 제외하고, 순수하게 분류·설명·목차에서 추출된 주제어만 뽑아주세요.\n"
-            "출력 형식: $a키워드1 $a키워드2 …"
+            "1) 이 책의 주제를 고려하여 KDC 번호 하나를 추천해 주세요.\n"
+            f"2) 최대 {max_keywords}개의 MARC 653 주제어를 한 줄로 뽑아 주세요. "
+            "“제목”에 사용된 단어는 제외하고, 순수하게 분류·설명·목차에서 추출된 주제어만 뽑아주세요.\n\n"
+            "JSON으로만 응답해 주세요:\n"
+            '{"kdc": "813.7", "keywords": ["키워드1", "키워드2"]}'
         )
     }
     try:
-        resp = gpt_client.chat.completions.create(
-            model="gpt-4",
-            messages=[system_msg, user_msg],
-            temperature=0.2,
-            max_tokens=150,
-        )
-        # 1) 원본 응답을 raw에 담습니다
-        raw = resp.choices[0].message.content.strip()
-
-        # 2) $a … 다음 $a 또는 끝까지 캡처 (non-greedy)
-        pattern = re.compile(r"\$a(.*?)(?=(?:\$a|$))", re.DOTALL)
-        kws = [m.group(1).strip() for m in pattern.finditer(raw)]
-
-        # 3) 각 키워드 내부 공백 제거
-        kws = [kw.replace(" ", "") for kw in kws]
-
-        # 4) 다시 "$a키워드" 형태로 조립
-        return "".join(f"$a{kw}" for kw in kws)
-
+        data = json.loads(_ask_gpt_json(GPT_MODEL, system_msg["content"], user_msg["content"], max_tokens=200))
     except Exception as e:
-        st.warning(f"⚠️ 653 주제어 생성 실패: {e}")
-        return None
-    
-
-
-# 📚 MARC 생성
+        st.warning(f"🧠 GPT 오류 (KDC/653): {e}")
+        return "000", None
+
+    kdc = str(data.get("kdc") or "").strip() or "000"
+    raw_kws = data.get("keywords") or []
+    if isinstance(raw_kws, str):
+        raw_kws = [raw_kws]
+    # "$a키워드1 $a키워드2"처럼 와도 "$a"로 잘라 키워드만 추출 + 내부 공백 제거
+    kws = [p.strip().replace(" ", "") for kw in raw_kws for p in str(kw).split("$a") if p.strip()]
+    return kdc, "".join(f"$a{kw}" for kw in kws[:max_keywords])
+
+
+# 알라딘은 키 오류·쿼터 초과도 HTTP 200 + errorCode로 돌려줌 → 빈 dict로 삼키지 말고 예외 (캐시 안 됨)
+def _aladin_first_item(payload):
+    if "errorCode" in payload:
+        raise RuntimeError(f"알라딘 오류 {payload['errorCode']}: {payload.get('errorMessage', '')}")
+    items = payload.get("item") or []
+    if not items:
+        raise LookupError("알라딘 검색 결과 없음")
+    return items[0]
+
+# 📚 알라딘 일괄 조회 (ItemLookUp은 ItemId를 하나씩만 받으므로, 요청은 ISBN마다 보내되 _aladin_session 풀로 커넥션 재사용)
 @st.cache_data(show_spinner=False)
-def fetch_book_data_from_aladin(isbn, reg_mark="", reg_no="", copy_symbol=""):
-    import re
-    from concurrent.futures import ThreadPoolExecutor
-
-    # 1) 알라딘 + (옵션) 국중 부가기호 동시 요청
+@disk_cached(ignore=(1, "_session"))
+def _fetch_aladin_item(isbn, _session):
+    # _session은 캐시 키에서 제외됨 / 오류는 예외로 올려서 캐시되지 않게 함
     url = (
         f"https://www.aladin.co.kr/ttb/api/ItemLookUp.aspx?"
         f"ttbkey={aladin_key}&itemIdType=ISBN&ItemId={isbn}"
         f"&output=js&Version=20131101"
     )
-    with ThreadPoolExecutor(max_workers=2) as ex:
-        future_aladin = ex.submit(lambda: requests.get(url, verify=False, timeout=5))
-        future_nlk    = ex.submit(fetch_additional_code_from_nlk, isbn)
-
+    resp = _session.get(url, timeout=5)
+    resp.raise_for_status()
+    return _aladin_first_item(orjson.loads(resp.content))
+
+def fetch_aladin_batch(isbns):
+    """ISBN 목록 → ({isbn: 알라딘 item}, {isbn: 오류}) (중복 ISBN은 한 번만 조회)"""
+    items, errors = {}, {}
+    futures = {isbn: _submit_with_ctx(_fetch_aladin_item, isbn, _aladin_session) for isbn in dict.fromkeys(isbns)}
+    for isbn, fut in futures.items():
         try:
-            resp = future_aladin.result()
-            resp.raise_for_status()
-            data = resp.json().get("item", [{}])[0]
+            items[isbn] = fut.result()
         except Exception as e:
-            st.error(f"🚨 알라딘API 오류: {e}")
-            return ""
+            errors[isbn] = e
+    return items, errors
+
 
-        add_code = future_nlk.result()  # 실패 시 빈 문자열
+# 📚 ISBN별 서지 정보 (알라딘 item은 fetch_aladin_batch에서 받아 전달 / 국중·GPT 호출은 여기서만)
+#    캐시 키는 ISBN 하나뿐(_data는 키에서 제외) → 소장기호가 달라도 같은 ISBN이면 재호출 없음
+@st.cache_data(ttl=86400, max_entries=None, show_spinner=False)
+def _fetch_book_facts(isbn, _data):
+    # 1) (옵션) 국중 부가기호
+    add_code = fetch_additional_code_from_nlk(isbn)  # 실패 시 빈 문자열
 
     # 2) 메타데이터 (알라딘)
-    title       = data.get("title",       "제목없음")
-    author      = data.get("author",      "저자미상")
-    publisher   = data.get("publisher",   "출판사미상")
-    pubdate     = data.get("pubDate",     "2025")  # 'YYYY' 또는 'YYYY-MM-DD'
-    category    = data.get("categoryName", "")
-    description = data.get("description", "")
-    toc         = data.get("subInfo", {}).get("toc", "")
-    price       = str(data.get("priceStandard", ""))  # 020/950 용
+    title       = _data.get("title",       "제목없음")
+    author      = _data.get("author",      "저자미상")
+    publisher   = _data.get("publisher",   "출판사미상")
+    pubdate     = _data.get("pubDate",     "2025")  # 'YYYY' 또는 'YYYY-MM-DD'
+    category    = _data.get("categoryName", "")
+    description = _data.get("description", "")
+    toc         = _data.get("subInfo", {}).get("toc", "")
+    price       = str(_data.get("priceStandard", ""))  # 020/950 용
 
     # 3) =008 생성 (ISBN만으로 자동, country/lang은 임시 고정값 → 추후 override)
     tag_008 = "=008  " + build_008_from_isbn(
@@ -408,7 +443,7 @@ def fetch_book_data_from_aladin(isbn, reg_mark="", reg_no="", copy_symbol=""):
 
     # 4) 041/546 (간이 감지: 기존 로직 유지)
     lang_a  = detect_language(title)
-    lang_h  = detect_language(data.get("title", ""))
+    lang_h  = detect_language(_data.get("title", ""))
     tag_041 = f"=041  \\$a{lang_a}" + (f"$h{lang_h}" if lang_h != "und" else "")
     tag_546 = f"=546  \\$a{generate_546_from_041_kormarc(tag_041)}"
 
@@ -417,47 +452,59 @@ def fetch_book_data_from_aladin(isbn, reg_mark="", reg_no="", copy_symbol=""):
     if add_code:
         tag_020 += f"$g{add_code}"
 
-    # 6) 653/KDC — ✅ 여기서만 생성 (GPTAPI 최신 함수로 통일)
-    kdc     = recommend_kdc(title, author, api_key=openai_key)
-    gpt_653 = generate_653_with_gpt(category, title, description, toc, max_keywords=7)
+    # 6) 653/KDC — ✅ 여기서만 생성 (GPT 한 번 호출로 둘 다)
+    kdc, gpt_653 = recommend_kdc_and_653(title, author, category, description, toc, max_keywords=7)
     tag_653 = f"=653  \\{gpt_653.replace(' ', '')}" if gpt_653 else ""
 
-    # 7) 기본 MARC 라인
-    marc_lines = [
-        tag_008,
-        "=007  ta",
-        f"=245  00$a{title} /$c{author}",
-        f"=260  \\$a서울 :$b{publisher},$c{pubdate[:4]}.",
-    ]
+    series = _data.get("seriesInfo", {})
+    return {
+        "title": title, "author": author, "publisher": publisher,
+        "pubdate": pubdate, "price": price,
+        "series_name": (series.get("seriesName") or "").strip(),
+        "series_vol":  (series.get("volume")    or "").strip(),
+        "kdc": kdc,
+        "tag_008": tag_008, "tag_020": tag_020, "tag_041": tag_041,
+        "tag_546": tag_546, "tag_653": tag_653,
+    }
+
+
+# 📚 MARC 생성 (서지 정보 + 행별 소장기호 → 문자열 조립만, 외부 호출 없음)
+def fetch_book_data_from_aladin(facts, reg_mark="", reg_no="", copy_symbol=""):
+    # 7) 기본 MARC 필드 (태그 → 라인, 출력 시 태그 순으로 정렬)
+    marc_fields = {
+        "008": facts["tag_008"],
+        "007": "=007  ta",
+        "245": f"=245  00$a{facts['title']} /$c{facts['author']}",
+        "260": f"=260  \\$a서울 :$b{facts['publisher']},$c{facts['pubdate'][:4]}.",
+    }
 
     # 8) 490·830 (총서)
-    series = data.get("seriesInfo", {})
-    name = (series.get("seriesName") or "").strip()
-    vol  = (series.get("volume")    or "").strip()
+    name = facts["series_name"]
+    vol  = facts["series_vol"]
     if name:
-        marc_lines.append(f"=490  \\$a{name};$v{vol}")
-        marc_lines.append(f"=830  \\$a{name};$v{vol}")
+        marc_fields["490"] = f"=490  \\$a{name};$v{vol}"
+        marc_fields["830"] = f"=830  \\$a{name};$v{vol}"
 
     # 9) 기타 필드
-    marc_lines.append(tag_020)
-    marc_lines.append(tag_041)
-    marc_lines.append(tag_546)
+    marc_fields["020"] = facts["tag_020"]
+    marc_fields["041"] = facts["tag_041"]
+    marc_fields["546"] = facts["tag_546"]
+    kdc = facts["kdc"]
     if kdc and kdc != "000":
-        marc_lines.append(f"=056  \\$a{kdc}$26")
-    if tag_653:
-        marc_lines.append(tag_653)
-    marc_lines.append(f"=950  0\\$b{price}")
+        marc_fields["056"] = f"=056  \\$a{kdc}$26"
+    if facts["tag_653"]:
+        marc_fields["653"] = facts["tag_653"]
+    marc_fields["950"] = f"=950  0\\$b{facts['price']}"
 
     # 10) 049: 소장기호(입력된 경우만)
     if reg_mark or reg_no or copy_symbol:
         line = f"=049  0\\$I{reg_mark}{reg_no}"
         if copy_symbol:
             line += f"$f{copy_symbol}"
-        marc_lines.append(line)
+        marc_fields["049"] = line
 
-    # 11) 번호 오름차순 정렬 후 출력
-    marc_lines.sort(key=lambda L: int(re.match(r"=(\d+)", L).group(1)))
-    return "\n".join(marc_lines)
+    # 11) 태그 번호 오름차순 출력 (세 자리 태그라 문자열 정렬 = 숫자 정렬)
+    return "\n".join(marc_fields[tag] for tag in sorted(marc_fields))
 
 
 
@@ -480,15 +527,25 @@ if uploaded_file:
 
 if isbn_list:
     st.subheader("📄 MARC 출력")
-    marc_results = []
-    for row in isbn_list:
-        isbn, reg_mark, reg_no, copy_symbol = row
-        marc = fetch_book_data_from_aladin(isbn, reg_mark, reg_no, copy_symbol)
-        if marc:
-            st.code(marc, language="text")
-            marc_results.append(marc)
-
-    full_text = "\n\n".join(marc_results)
+    rows = pd.DataFrame(isbn_list, columns=['ISBN', '등록기호', '등록번호', '별치기호'])
+    aladin_items, aladin_errors = fetch_aladin_batch(rows["ISBN"].tolist())
+    for isbn, err in aladin_errors.items():
+        st.error(f"🚨 알라딘API 오류 ({isbn}): {err}")
+
+    # 중복 ISBN은 한 번만 풀에 제출 (국중·GPT 호출은 ISBN당 1회) → 행마다 소장기호만 붙여 조립
+    futures = {
+        isbn: _submit_with_ctx(_fetch_book_facts, isbn, item)
+        for isbn, item in aladin_items.items()
+    }
+    facts_by_isbn = {isbn: fut.result() for isbn, fut in futures.items()}
+    rows["MARC"] = pd.Series({
+        i: fetch_book_data_from_aladin(facts_by_isbn[isbn], *rest)
+        for i, (isbn, *rest) in zip(rows.index, rows.itertuples(index=False))
+        if isbn in facts_by_isbn
+    }, dtype=object)
+
+    st.dataframe(rows[["ISBN", "MARC"]], use_container_width=True)
+    full_text = "\n\n".join(rows["MARC"].dropna())
     st.download_button("📦 모든 MARC 다운로드", data=full_text, file_name="marc_output.txt", mime="text/plain")
 
 # 📄 템플릿 예시 다운로드
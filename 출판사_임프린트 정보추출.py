@@ -1,14 +1,37 @@
 # 필요 패키지 설치
-# pip install selenium webdriver-manager pandas
+# pip install selenium webdriver-manager pandas lxml
 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import pandas as pd
-import time
+import lxml.html
+
+# 페이지 소스를 한 번에 받아 lxml로 파싱 (행·칸마다 WebDriver 왕복하지 않음)
+_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+_ROWS_XPATH = f"//table[{_CLASS.format('table')}]//tbody/tr"
+_SERIAL_XPATH = f"./td[{_CLASS.format('text-center')}][1]"
+_TITLE_ONCLICK_XPATH = f"./td[{_CLASS.format('title')}][1]/@onclick"
+
+def page_rows(driver):
+    return lxml.html.fromstring(driver.page_source).xpath(_ROWS_XPATH)
+
+def cell_text(cell):
+    return " ".join(cell.text_content().split())
+
+# 클릭 후 기존 표가 교체(stale)되고 새 행이 뜰 때까지만 대기 (고정 sleep 대신)
+def click_and_wait(driver, element, timeout=10):
+    old_rows = driver.find_elements(By.CSS_SELECTOR, "table.table tbody tr")
+    driver.execute_script("arguments[0].click();", element)
+    if old_rows:
+        WebDriverWait(driver, timeout).until(EC.staleness_of(old_rows[0]))
+    WebDriverWait(driver, timeout).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "table.table tbody tr"))
+    )
 
 # =========================
 # ChromeDriver 세팅 (백그라운드 실행)
@@ -27,41 +50,50 @@ def create_driver():
     return driver
 
 # =========================
-# 순번 기반 출판사 ID 추출 (다음 페이지 탐색 포함)
+# 순번 → 출판사 ID 매핑 (목록 페이지를 한 번만 훑으며 범위 내 순번 모두 기록)
 # =========================
-def get_publisher_id_by_serial(driver, serial):
+def collect_publisher_ids(driver, start_serial, end_serial):
     url = "https://bnk.kpipa.or.kr/home/v3/addition/adiPblshrInfoList"
     driver.get(url)
-    time.sleep(2)
 
-    while True:
+    publisher_ids = {}
+    low, high = end_serial, start_serial
+    wanted = high - low + 1
+    page_num = 1
+
+    while len(publisher_ids) < wanted:
         try:
-            rows = WebDriverWait(driver, 5).until(
+            WebDriverWait(driver, 5).until(
                 EC.presence_of_all_elements_located((By.CSS_SELECTOR, "table.table tbody tr"))
             )
-            for row in rows:
+            below_range = False
+            for row in page_rows(driver):
                 try:
-                    serial_cell = row.find_element(By.CSS_SELECTOR, "td.text-center")
-                    row_serial = int(serial_cell.text.strip())
-                    if row_serial == serial:
-                        onclick_attr = row.find_element(By.CSS_SELECTOR, "td.title").get_attribute("onclick")
-                        publisher_id = onclick_attr.split("'")[1]
-                        return publisher_id
+                    row_serial = int(cell_text(row.xpath(_SERIAL_XPATH)[0]))
+                    if row_serial < low:
+                        below_range = True  # 목록은 순번 내림차순 → 이후 페이지는 볼 필요 없음
+                        continue
+                    if row_serial <= high:
+                        onclick_attr = row.xpath(_TITLE_ONCLICK_XPATH)[0]
+                        publisher_ids[row_serial] = onclick_attr.split("'")[1]
                 except:
                     continue
+            print(f"목록 {page_num} 페이지 확인, 누적 ID: {len(publisher_ids)}")
+            if below_range:
+                break
 
             # 다음 페이지 클릭
             try:
                 next_button = driver.find_element(By.CSS_SELECTOR, "a[title='다음 페이지로 이동']")
                 if "disabled" in next_button.get_attribute("class"):
                     break
-                driver.execute_script("arguments[0].click();", next_button)
-                time.sleep(2)
+                click_and_wait(driver, next_button)
+                page_num += 1
             except:
                 break
         except:
             break
-    return None
+    return publisher_ids
 
 # =========================
 # 출판사 페이지 크롤링
@@ -69,26 +101,27 @@ def get_publisher_id_by_serial(driver, serial):
 def crawl_publisher_by_id(driver, publisher_id):
     url = f"https://bnk.kpipa.or.kr/home/v3/addition/adiPblshrInfoDetailView/seq_{publisher_id}"
     driver.get(url)
-    time.sleep(2)
 
-    # '도서 전체보기' 클릭
+    # '도서 전체보기' 클릭 (버튼이 없을 때만 이 출판사를 건너뜀)
     try:
         all_books_button = WebDriverWait(driver, 5).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, f"a.goto-all-books[onclick*='{publisher_id}']"))
         )
-        driver.execute_script("arguments[0].click();", all_books_button)
-        time.sleep(3)
-    except:
+    except TimeoutException:
         print(f"출판사 {publisher_id} 도서 전체보기 버튼 없음")
         return [], 0
+    # 클릭 후 표 교체 대기가 시간 초과돼도 지금 떠 있는 표로 계속 진행
+    try:
+        click_and_wait(driver, all_books_button)
+    except TimeoutException:
+        print(f"출판사 {publisher_id} 도서 전체보기 후 표 갱신 대기 시간 초과 (현재 표로 계속)")
 
     # 리스트 보기 강제 전환
     try:
         list_view_btn = WebDriverWait(driver, 5).until(
             EC.element_to_be_clickable((By.CSS_SELECTOR, "a[onclick*=\"fnPageView('searchTypeView','list'\"]"))
         )
-        driver.execute_script("arguments[0].click();", list_view_btn)
-        time.sleep(3)
+        click_and_wait(driver, list_view_btn)
     except Exception as e:
         print(f"리스트 보기 전환 실패: {e}")
 
@@ -100,17 +133,17 @@ def crawl_publisher_by_id(driver, publisher_id):
 
     while True:
         print(f"출판사 {publisher_id}: {page_num} 페이지 크롤링 중...")
-        rows = driver.find_elements(By.CSS_SELECTOR, "table.table tbody tr")
         stop_flag = False
 
-        for row in rows:
+        for row in page_rows(driver):
             try:
-                seq_cell = row.find_element(By.CSS_SELECTOR, "td.text-center:first-child")
-                book_seq = int(seq_cell.text.strip())
+                cells = row.xpath("./td")
+                if "text-center" not in (cells[0].get("class") or "").split():
+                    continue
+                book_seq = int(cell_text(cells[0]))
 
                 # 도서 정보 수집
-                imprint_cell = row.find_element(By.CSS_SELECTOR, "td:nth-child(5)")
-                text = imprint_cell.text.strip()
+                text = cell_text(cells[4])
                 if text:
                     imprints_set.add(text)
                 book_count += 1
@@ -128,8 +161,7 @@ def crawl_publisher_by_id(driver, publisher_id):
         try:
             next_buttons = driver.find_elements(By.CSS_SELECTOR, "a[title='다음 페이지로 이동']")
             if next_buttons and "disabled" not in next_buttons[0].get_attribute("class"):
-                driver.execute_script("arguments[0].click();", next_buttons[0])
-                time.sleep(2)
+                click_and_wait(driver, next_buttons[0])
                 page_num += 1
             else:
                 break
@@ -147,10 +179,12 @@ def crawl_publishers(start_serial, end_serial):
     total_books = 0
     found_serials = 0
 
+    publisher_ids = collect_publisher_ids(driver, start_serial, end_serial)
+
     for serial in range(start_serial, end_serial - 1, -1):
         try:
             print(f"순번 {serial} 크롤링 중...")
-            publisher_id = get_publisher_id_by_serial(driver, serial)
+            publisher_id = publisher_ids.get(serial)
             if not publisher_id:
                 print(f"순번 {serial} ID 없음")
                 continue